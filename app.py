@@ -2,17 +2,28 @@ import streamlit as st
 import pandas as pd
 import os
 import io
+import shutil
 import zipfile
 import tempfile
-import subprocess
-import sys
-import xlrd
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
 from openpyxl.utils import get_column_letter
 from openpyxl.worksheet.page import PageMargins
 
+from identity import resolve_employee_names
+from instrumentation import folder_bytes, run_record, stage, stage_rows
+from parse_cache import prune_cache, read_source_file_cached, user_cache_dir
+from pipeline import run_school_pipeline
+from merged_writer import THIN_BORDER, add_named_style
+from report_engine import (
+    FEB_DISPLAY, active_columns, clean_employee_names, employee_row_index,
+    employee_totals, february_rows, non_zero_mask
+)
+from report_writer import safe_filename, zip_folder
+from schema import EXCLUDE_COLUMNS, MONTH_DISPLAY, MONTH_ORDER, NUMERIC_COLUMNS, apply_schema
+
 # ===== PAGE CONFIG =====
 st.set_page_config(
     page_title="Excel Merger & Report Generator",
@@ -58,93 +69,54 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ===== CONSTANTS =====
-MONTH_ORDER = [
-    "mar 25", "mar25", "MAR 25", "apr 25", "apr25", "APR 25",
-    "may 25", "may25", "MAY 25", "jun 25", "jun25", "JUN 25",
-    "jul 25", "jul25", "JUL 25", "aug 25", "aug25", "AUG 25",
-    "sep 25", "sep25", "SEP 25", "oct 25", "oct25", "OCT 25",
-    "nov 25", "nov25", "NOV 25", "dec 25", "dec25", "DEC 25",
-    "jan 26", "jan26", "JAN 26", "feb 26", "feb26", "FEB 26"
-]
-
-MONTH_DISPLAY = {
-    "mar 25": "Mar-2025", "mar25": "Mar-2025", "MAR 25": "Mar-2025",
-    "apr 25": "Apr-2025", "apr25": "Apr-2025", "APR 25": "Apr-2025",
-    "may 25": "May-2025", "may25": "May-2025", "MAY 25": "May-2025",
-    "jun 25": "Jun-2025", "jun25": "Jun-2025", "JUN 25": "Jun-2025",
-    "jul 25": "Jul-2025", "jul25": "Jul-2025", "JUL 25": "Jul-2025",
-    "aug 25": "Aug-2025", "aug25": "Aug-2025", "AUG 25": "Aug-2025",
-    "sep 25": "Sep-2025", "sep25": "Sep-2025", "SEP 25": "Sep-2025",
-    "oct 25": "Oct-2025", "oct25": "Oct-2025", "OCT 25": "Oct-2025",
-    "nov 25": "Nov-2025", "nov25": "Nov-2025", "NOV 25": "Nov-2025",
-    "dec 25": "Dec-2025", "dec25": "Dec-2025", "DEC 25": "Dec-2025",
-    "jan 26": "Jan-2026", "jan26": "Jan-2026", "JAN 26": "Jan-2026",
-    "feb 26": "Feb-2026", "feb26": "Feb-2026", "FEB 26": "Feb-2026"
-}
-
-EXCLUDE_COLUMNS = [
-    "Unnamed: 0", "SR.NO", "Source_File", "Month", "Month_Order",
-    "EMPLOYEE NAME", "GENDER M/F", "NAME OF SCHOOL",
-    "GROSS AFTER DEDUCTING FA", "GROSS PAYMENT AFTER GOVT DEDUCTIONS",
-    "GROSS PAYMENT AFTER NPS DEDUCTIONS", "NGR(TOTAL DEDUCTIONS)",
-    "EMPLOYEE NET SALARY", "TOTAL GOVT DEDUCTIONS", "NPS TOTAL"
-]
-
-INFO_COLUMNS = [
-    "BLOCK / TALUKA", "SCHOOL UDISE CODE", "SCHOOL SHALARTH DDO CODE",
-    "S.R NO OF EMPL", "SHALARTH ID", "DESIGNATION ", "GPF NO", "DCPS NO",
-    "PRAN NO", "PAN NO", "ADHAR NO", "MOB NO", "EMAIL ID",
-    "DDO BANK NAME", "DDO BANK ACCOUNT NUMBER", "DDO BANK IFSC CODE",
-    "BANK NAME", "BANK ACCOUNT NUMBER", "BANK IFSC CODE", "BRANCH NAME",
-    "PAY MATRIX", "REMARKS"
-]
-
-NUMERIC_COLUMNS = [
-    "BASIC PAY", "D.A", "HRA", "T.A", "T.A ARREARS", "TRIBAL ALLOWANCE",
-    "WASHING ALLOWANCE ", "DA ARREARS ", "HRA ARREARS ", "BASIC ARREARS ",
-    "CLA", "NPS EMPR ALLOW", "TOTAL PAY", "F A",
-    "GPF", "GPF ADV", "PT", "GIS(ZP)", "GIS SCOUT", "DCPS REGULAR",
-    "DCPS DELAYED", "DCPS PAY ARREARS RECOVERY", "REVENUE STAMP",
-    "DCPS DA ARREARS RECOVERY", "GROUP ACCIDENTAL POLICY", "NAA",
-    "TOTAL GOVT DEDUCTIONS",
-    "NPS EMPR CONTRI", "NPS EMP CONTRI", "NPS EMPR CONTRI ARR",
-    "NPS EMP CONTRI ARR", "NPS TOTAL",
-    "INCOME TAX", "CO-OP BANK", "NGR(LIC)", "NGR(SOCIETY LOAN)", "NGR(MISC)",
-    "NGR(OTHER RECOVERY)", "NGR(RD)", "NGR(OTHER DEDUCTION)"
-]
+# Parse cache shared across runs (the scripts run under a fresh temp root each
+# time); per user, never the shared temp folder, since entries are unpickled
+PARSE_CACHE_DIR = os.environ.get("EXCEL_MERGER_CACHE") or user_cache_dir()
+
+# Buffer size when copying uploads and zip entries to disk
+COPY_CHUNK_SIZE = 1024 * 1024
 
 
 # ===== HELPER FUNCTIONS =====
 
-class VirtualUploadedFile:
-    """Minimal file-like wrapper for zip entries."""
-    def __init__(self, name, content):
-        self.name = name
-        self._buffer = io.BytesIO(content)
+class ArchiveMember:
+    """
+    An .xls entry of an uploaded zip. Nothing is decompressed up front:
+    read() inflates the entry when the parser asks for it and save_to()
+    streams it straight to disk, so only one entry is in memory at a time.
+    """
+    def __init__(self, zf, info):
+        self.name = info.filename
+        self.size = info.file_size
+        self._zf = zf
+        self._info = info
 
     def read(self):
-        return self._buffer.read()
+        with self._zf.open(self._info) as src:
+            return src.read()
 
     def seek(self, pos):
-        self._buffer.seek(pos)
+        pass  # every read() starts at the beginning of the entry
+
+    def save_to(self, path):
+        with self._zf.open(self._info) as src, open(path, "wb") as dst:
+            shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
 
 
 def extract_archive_files(archive_file):
-    """Extract .xls files from a zip upload and return file-like objects."""
-    extracted = []
+    """List the .xls entries of a zip upload as lazily read file-like objects."""
     name = getattr(archive_file, "name", "").lower()
-    content = archive_file.read()
-    archive_file.seek(0)
 
     if name.endswith(".zip"):
-        with zipfile.ZipFile(io.BytesIO(content)) as zf:
-            for info in zf.infolist():
-                if info.is_dir():
-                    continue
-                if info.filename.lower().endswith(".xls"):
-                    content = zf.read(info.filename)
-                    extracted.append(VirtualUploadedFile(info.filename, content))
-        return extracted
+        # The zip is read in place from the upload; the ZipFile stays open
+        # for as long as its members are in use
+        archive_file.seek(0)
+        zf = zipfile.ZipFile(archive_file)
+        return [
+            ArchiveMember(zf, info)
+            for info in zf.infolist()
+            if not info.is_dir() and info.filename.lower().endswith(".xls")
+        ]
 
     st.error("Unsupported archive type. Please upload a .zip file.")
     return []
@@ -168,72 +140,20 @@ def save_uploaded_files(selected_files, root_dir, school_name):
         file_name = parts[-1]
         file_path = os.path.join(month_path, file_name)
 
-        content = uploaded_file.read()
-        uploaded_file.seek(0)
+        if hasattr(uploaded_file, "save_to"):
+            uploaded_file.save_to(file_path)
+            continue
 
         with open(file_path, "wb") as f:
-            f.write(content)
+            shutil.copyfileobj(uploaded_file, f, COPY_CHUNK_SIZE)
+        uploaded_file.seek(0)
 
     return base_path
 
 
 def run_scripts(root_dir, school_name):
-    """Run merge_alternate.py then report.py using temp root directory."""
-    env = os.environ.copy()
-    env["EXCEL_MERGER_ROOT"] = root_dir
-
-    merge_cmd = [sys.executable, "merge_alternate.py", school_name]
-    report_cmd = [sys.executable, "report.py", school_name]
-    summary_cmd = [sys.executable, "summary.py", school_name]
-
-    merge_result = subprocess.run(
-        merge_cmd,
-        capture_output=True,
-        text=True,
-        env=env
-    )
-    if merge_result.returncode != 0:
-        raise RuntimeError(merge_result.stderr or merge_result.stdout)
-
-    report_result = subprocess.run(
-        report_cmd,
-        capture_output=True,
-        text=True,
-        env=env
-    )
-    if report_result.returncode != 0:
-        raise RuntimeError(report_result.stderr or report_result.stdout)
-
-    summary_result = subprocess.run(
-        summary_cmd,
-        capture_output=True,
-        text=True,
-        env=env
-    )
-    if summary_result.returncode != 0:
-        raise RuntimeError(summary_result.stderr or summary_result.stdout)
-
-
-def zip_folder(folder_path):
-    """Create a ZIP of a folder and return bytes."""
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-        for root, _, files in os.walk(folder_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                arcname = os.path.relpath(file_path, folder_path)
-                zip_file.write(file_path, arcname=arcname)
-    zip_buffer.seek(0)
-    return zip_buffer
-
-
-def find_header_row(file_content):
-    """Find the header row containing SR.NO"""
-    preview = pd.read_excel(io.BytesIO(file_content), engine="xlrd", header=None, nrows=40)
-    for i, row in preview.iterrows():
-        if row.astype(str).str.upper().isin(["SR.NO"]).any():
-            return i
-    raise ValueError("SR.NO not found in file")
+    """Merge, then write the reports and summary in-process (see pipeline.py) under the temp root directory."""
+    run_school_pipeline(school_name, root_dir, cache_dir=PARSE_CACHE_DIR)
 
 
 def process_uploaded_files(uploaded_files, school_name, progress_bar, status_text):
@@ -266,13 +186,8 @@ def process_uploaded_files(uploaded_files, school_name, progress_bar, status_tex
                 content = file.read()
                 file.seek(0)  # Reset for potential re-read
                 
-                header_row = find_header_row(content)
-                df = pd.read_excel(io.BytesIO(content), engine="xlrd", header=header_row)
-                df = df.dropna(how="all")
-                
-                # Remove Grand Total rows
-                if "SR.NO" in df.columns:
-                    df = df[df["SR.NO"].astype(str).str.upper() != "GRAND TOTAL"]
+                # One xlrd open per file (or none if cached); empty and Grand Total rows already dropped
+                df = read_source_file_cached(content, cache_dir=PARSE_CACHE_DIR, label=file.name)['data']
                 
                 df["Source_File"] = file.name.split("/")[-1]
                 df["Month"] = month
@@ -283,100 +198,61 @@ def process_uploaded_files(uploaded_files, school_name, progress_bar, status_tex
         if month_tables:
             all_data[month] = pd.concat(month_tables, ignore_index=True)
     
+    prune_cache(PARSE_CACHE_DIR)
     return all_data
 
 
 def create_merged_workbook(all_data, school_name):
-    """Create merged Excel workbook with monthly sheets"""
-    wb = Workbook()
-    wb.remove(wb.active)
-    
-    thin_border = Border(
-        left=Side(style='thin'), right=Side(style='thin'),
-        top=Side(style='thin'), bottom=Side(style='thin')
+    """Create merged Excel workbook with monthly sheets (streamed, write-only)"""
+    wb = Workbook(write_only=True)
+    
+    # Named styles registered once; cells only reference them
+    header_style = add_named_style(
+        wb, "Merged Header",
+        font=Font(bold=True), border=THIN_BORDER,
+        alignment=Alignment(horizontal='center', wrap_text=True)
     )
+    data_style = add_named_style(wb, "Merged Data", border=THIN_BORDER)
+    
+    def styled(ws, value, style):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = style
+        return cell
     
     for month, df in sorted(all_data.items()):
         ws = wb.create_sheet(title=month[:31])  # Excel sheet name limit
         
+        # Column widths must be set before rows are streamed
+        for col_idx in range(1, len(df.columns) + 1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = 12
+        
         # Write header
-        for col_idx, col_name in enumerate(df.columns, start=1):
-            cell = ws.cell(row=1, column=col_idx, value=col_name)
-            cell.font = Font(bold=True)
-            cell.border = thin_border
-            cell.alignment = Alignment(horizontal='center', wrap_text=True)
+        ws.append([styled(ws, col_name, header_style) for col_name in df.columns])
         
         # Write data
-        for row_idx, row in enumerate(df.values, start=2):
-            for col_idx, value in enumerate(row, start=1):
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                cell.border = thin_border
-        
-        # Auto-width columns
-        for col_idx in range(1, len(df.columns) + 1):
-            ws.column_dimensions[get_column_letter(col_idx)].width = 12
+        for row in df.values:
+            ws.append([styled(ws, value, data_style) for value in row])
     
     return wb
 
 
 def get_value(row, col_name):
-    """Safely get value from row"""
-    try:
-        val = row.get(col_name, 0)
-        if pd.isna(val) or val == "" or val is None:
-            return 0
-        return val
-    except:
+    """Value of a column in a row (0 when missing)"""
+    val = row.get(col_name, 0)
+    if pd.isna(val) or val == "":
         return 0
+    return val
 
 
-def is_zero_or_empty(val):
-    """Check if value is zero or empty"""
-    if val is None or val == "" or pd.isna(val):
-        return True
-    try:
-        return float(val) == 0
-    except:
-        return False
-
-
-def get_non_zero_columns(emp_df, numeric_cols):
-    """Get columns with at least one non-zero value"""
-    non_zero_cols = []
-    for col in numeric_cols:
-        if col in emp_df.columns:
-            has_non_zero = any(not is_zero_or_empty(val) for val in emp_df[col])
-            if has_non_zero:
-                non_zero_cols.append(col)
-    return non_zero_cols
-
-
-def create_february_row(jan_row, active_columns):
-    """Create February row based on January data"""
-    feb_row = jan_row.copy()
-    feb_row["Month"] = "FEB 26"
-    
-    pt_val = get_value(jan_row, "PT")
-    if pt_val == 200:
-        feb_row["PT"] = 300
-    elif pt_val == 0 or pt_val == "" or pd.isna(pt_val):
-        feb_row["PT"] = 0
-    else:
-        feb_row["PT"] = 300
-    
-    feb_row["GROUP ACCIDENTAL POLICY"] = 531
-    if "INCOME TAX" in feb_row.index:
-        feb_row["INCOME TAX"] = 0
-    return feb_row
-
-
-def create_employee_report(emp_name, emp_df, all_numeric_cols):
-    """Create individual employee report"""
+def create_employee_report(emp_name, emp_df, all_numeric_cols, mask=None, feb_rows=None):
+    """
+    Create individual employee report (mask: non_zero_mask() of all
+    employees, feb_rows: the employee's february_rows(), if precomputed)
+    """
     wb = Workbook()
     ws = wb.active
     ws.title = "Income Tax Details"
     
-    jan_variants = ["jan26", "jan 26", "JAN 26"]
     feb_variants = ["feb26", "feb 26", "FEB 26"]
 
     # Sort by month
@@ -391,34 +267,15 @@ def create_employee_report(emp_name, emp_df, all_numeric_cols):
     
     first_row = emp_df.iloc[0]
     
-    # Check for January/February
-    has_jan = any(v in emp_df["Month"].values for v in jan_variants)
-    has_feb = any(v in emp_df["Month"].values for v in feb_variants)
-    
-    jan_month = None
-    for v in jan_variants:
-        if v in emp_df["Month"].values:
-            jan_month = v
-            break
-    
-    # Get non-zero columns
-    active_numeric_cols = get_non_zero_columns(emp_df, all_numeric_cols)
-
-    # Always keep INCOME TAX column even if all values are zero
-    if "INCOME TAX" in all_numeric_cols and "INCOME TAX" in emp_df.columns:
-        if "INCOME TAX" not in active_numeric_cols:
-            active_numeric_cols.append("INCOME TAX")
+    # Synthetic February row when January exists but February doesn't
+    if feb_rows is None:
+        feb_rows = february_rows(emp_df)
+    feb_data = feb_rows.iloc[0] if len(feb_rows) else None
     
-    if has_jan and not has_feb and jan_month:
-        jan_data = emp_df[emp_df["Month"] == jan_month].iloc[0]
-        pt_val = get_value(jan_data, "PT")
-        if pt_val == 200 or (pt_val and pt_val != 0):
-            if "PT" not in active_numeric_cols:
-                active_numeric_cols.append("PT")
-        if "GROUP ACCIDENTAL POLICY" not in active_numeric_cols:
-            active_numeric_cols.append("GROUP ACCIDENTAL POLICY")
-    
-    active_numeric_cols = [col for col in all_numeric_cols if col in active_numeric_cols]
+    # Columns with non-zero values, plus the Income Tax / February special cases
+    if mask is None:
+        mask = non_zero_mask(emp_df, all_numeric_cols)
+    active_numeric_cols = active_columns(mask, emp_name, all_numeric_cols, feb_data)
     
     # Styles
     title_font = Font(bold=True, size=14)
@@ -479,20 +336,10 @@ def create_employee_report(emp_name, emp_df, all_numeric_cols):
         current_row += 1
     
     # February row
-    if has_jan and not has_feb and jan_month:
-        jan_data = emp_df[emp_df["Month"] == jan_month].iloc[0]
-        feb_data = create_february_row(jan_data, active_numeric_cols)
-        
-        data = [sr_no, "Feb-2026"]
+    if feb_data is not None:
+        data = [sr_no, FEB_DISPLAY]
         for col in active_numeric_cols:
-            if col == "PT":
-                data.append(feb_data["PT"])
-            elif col == "GROUP ACCIDENTAL POLICY":
-                data.append(531)
-            elif col == "INCOME TAX":
-                data.append(0)
-            else:
-                data.append(get_value(feb_data, col))
+            data.append(get_value(feb_data, col))
         
         for col_idx, value in enumerate(data, start=1):
             cell = ws.cell(row=current_row, column=col_idx, value=value)
@@ -503,36 +350,9 @@ def create_employee_report(emp_name, emp_df, all_numeric_cols):
         sr_no += 1
         current_row += 1
     
-    # Total row
-    def safe_sum(col_name):
-        try:
-            ser = emp_df[col_name].fillna(0)
-            if col_name == "INCOME TAX" and "Month" in emp_df.columns:
-                ser = ser.where(~emp_df["Month"].isin(feb_variants), 0)
-            total = ser.sum()
-            if has_jan and not has_feb and jan_month:
-                jan_data = emp_df[emp_df["Month"] == jan_month].iloc[0]
-                feb_data = create_february_row(jan_data, active_numeric_cols)
-                if col_name == "PT":
-                    total += feb_data["PT"]
-                elif col_name == "GROUP ACCIDENTAL POLICY":
-                    total += 531
-                elif col_name == "INCOME TAX":
-                    total += 0
-                else:
-                    feb_val = get_value(feb_data, col_name)
-                    if feb_val:
-                        try:
-                            total += float(feb_val)
-                        except:
-                            pass
-            return total
-        except:
-            return 0
-    
-    totals = ["", "Total"]
-    for col in active_numeric_cols:
-        totals.append(safe_sum(col))
+    # Total row (all months plus the synthetic February)
+    total_row = employee_totals(emp_df, active_numeric_cols, feb=feb_rows).iloc[0]
+    totals = ["", "Total"] + [total_row[col] for col in active_numeric_cols]
     
     for col_idx, value in enumerate(totals, start=1):
         cell = ws.cell(row=current_row, column=col_idx, value=value)
@@ -584,22 +404,52 @@ def create_employee_report(emp_name, emp_df, all_numeric_cols):
     return wb
 
 
-def generate_all_reports(all_data, progress_bar, status_text):
-    """Generate reports for all employees"""
-    # Combine all months
-    combined_df = pd.concat(all_data.values(), ignore_index=True)
+def prepare_report_data(all_data):
+    """
+    Combine and type all months once for report rendering: numeric columns,
+    non-zero mask, synthetic February rows and a row index per employee.
+    """
+    combined_df, coerced = apply_schema(pd.concat(all_data.values(), ignore_index=True))
+    if len(coerced):
+        st.info(f"{len(coerced)} non-numeric cells in money columns were treated as empty")
     
     # Get numeric columns
     actual_numeric_cols = [col for col in NUMERIC_COLUMNS if col in combined_df.columns and col not in EXCLUDE_COLUMNS]
     
     # Find employee name column
     EMP_NAME_COL = "EMPLOYEE NAME"
-    combined_df[EMP_NAME_COL] = combined_df[EMP_NAME_COL].astype(str).str.strip().str.upper()
-    combined_df = combined_df[combined_df[EMP_NAME_COL] != ""]
-    combined_df = combined_df[combined_df[EMP_NAME_COL] != "NAN"]
-    combined_df = combined_df[~combined_df[EMP_NAME_COL].str.contains("GRAND TOTAL", case=False, na=False)]
+    combined_df = clean_employee_names(combined_df, EMP_NAME_COL)
+    combined_df, _ = resolve_employee_names(combined_df, EMP_NAME_COL)
+    feb = february_rows(combined_df, EMP_NAME_COL)
+    
+    return {
+        "df": combined_df,
+        "numeric_cols": actual_numeric_cols,
+        "employees": combined_df[EMP_NAME_COL].unique(),
+        "mask": non_zero_mask(combined_df, actual_numeric_cols, EMP_NAME_COL),
+        "feb": feb,
+        "rows": employee_row_index(combined_df, EMP_NAME_COL),
+        "feb_rows": employee_row_index(feb, EMP_NAME_COL),
+    }
+
+
+def render_employee_report(emp_name, data):
+    """Report of one employee as xlsx bytes, rows looked up in the prepared index"""
+    emp_df = data["df"].iloc[data["rows"][emp_name]]
+    feb = data["feb"]
+    feb_rows = feb.iloc[data["feb_rows"].get(emp_name, [])]
+    wb = create_employee_report(emp_name, emp_df, data["numeric_cols"], data["mask"], feb_rows)
     
-    employees = combined_df[EMP_NAME_COL].unique()
+    # Save to bytes
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+def generate_all_reports(all_data, progress_bar, status_text):
+    """Generate reports for all employees"""
+    data = prepare_report_data(all_data)
+    employees = data["employees"]
     reports = {}
     
     for idx, emp_name in enumerate(employees):
@@ -610,20 +460,7 @@ def generate_all_reports(all_data, progress_bar, status_text):
         progress_bar.progress((idx + 1) / len(employees))
         
         try:
-            emp_df = combined_df[combined_df[EMP_NAME_COL] == emp_name]
-            wb = create_employee_report(emp_name, emp_df, actual_numeric_cols)
-            
-            # Save to bytes
-            output = io.BytesIO()
-            wb.save(output)
-            output.seek(0)
-            
-            # Safe filename
-            safe_name = emp_name.replace("/", "_").replace("\\", "_").replace(":", "_")
-            safe_name = safe_name.replace("*", "_").replace("?", "_").replace('"', "_")
-            safe_name = safe_name.replace("<", "_").replace(">", "_").replace("|", "_")
-            
-            reports[f"{safe_name}.xlsx"] = output.getvalue()
+            reports[f"{safe_filename(emp_name)}.xlsx"] = render_employee_report(emp_name, data)
         except Exception as e:
             st.warning(f"Error creating report for {emp_name}: {e}")
     
@@ -712,8 +549,10 @@ if selected_files and school_name:
         status_text.text("Saving uploaded files to a temporary folder...")
         
         try:
-            with tempfile.TemporaryDirectory() as temp_root:
-                save_uploaded_files(selected_files, temp_root, school_name)
+            with run_record(f"app {school_name}") as run, tempfile.TemporaryDirectory() as temp_root:
+                with stage("upload_save", files=len(selected_files)) as items:
+                    save_uploaded_files(selected_files, temp_root, school_name)
+                    items['bytes'] = folder_bytes(temp_root)
                 
                 status_text.text("Running merge and report scripts...")
                 run_scripts(temp_root, school_name)
@@ -727,27 +566,31 @@ if selected_files and school_name:
                     st.stop()
                 
                 status_text.text("Preparing downloads...")
-                with open(merged_path, "rb") as f:
-                    merged_bytes = f.read()
+                with stage("package") as items:
+                    with open(merged_path, "rb") as f:
+                        merged_bytes = f.read()
                 
-                if not os.path.isdir(reports_dir):
-                    st.error("Reports folder not found. Please check your inputs.")
-                    st.stop()
+                    if not os.path.isdir(reports_dir):
+                        st.error("Reports folder not found. Please check your inputs.")
+                        st.stop()
                 
-                reports_zip_bytes = zip_folder(reports_dir).getvalue()
+                    reports_zip_bytes = zip_folder(reports_dir).getvalue()
                 
-                # Read summary file
-                summary_bytes = None
-                if os.path.exists(summary_path):
-                    with open(summary_path, "rb") as f:
-                        summary_bytes = f.read()
+                    # Read summary file
+                    summary_bytes = None
+                    if os.path.exists(summary_path):
+                        with open(summary_path, "rb") as f:
+                            summary_bytes = f.read()
                 
-                # Check for consolidated PDF (Excel print preview style)
-                pdf_path = os.path.join(reports_dir, f"{school_name}_All_Reports_Consolidated.pdf")
-                pdf_bytes = None
-                if os.path.exists(pdf_path):
-                    with open(pdf_path, "rb") as f:
-                        pdf_bytes = f.read()
+                    # Check for consolidated PDF (Excel print preview style)
+                    pdf_path = os.path.join(reports_dir, f"{school_name}_All_Reports_Consolidated.pdf")
+                    pdf_bytes = None
+                    if os.path.exists(pdf_path):
+                        with open(pdf_path, "rb") as f:
+                            pdf_bytes = f.read()
+                    items['bytes'] = sum(
+                        len(data) for data in (merged_bytes, reports_zip_bytes, summary_bytes, pdf_bytes) if data
+                    )
                 
                 # Persist results in session_state so download buttons work on reruns
                 st.session_state["results"] = {
@@ -756,6 +599,7 @@ if selected_files and school_name:
                     "reports_zip_bytes": reports_zip_bytes,
                     "summary_bytes": summary_bytes,
                     "pdf_bytes": pdf_bytes,
+                    "run": run,
                 }
             
             status_text.text("Done!")
@@ -820,6 +664,12 @@ if selected_files and school_name:
                 )
             else:
                 st.warning("PDF not generated (requires Excel)")
+        
+        # Where the time went, stage by stage
+        if results.get("run"):
+            run = results["run"]
+            with st.expander(f"⏱️ Stage timings ({run.get('wall_s', 0)}s total)"):
+                st.dataframe(pd.DataFrame(stage_rows(run)), hide_index=True, use_container_width=True)
 
 elif selected_files and not school_name:
     st.warning("Please enter the school name to continue.")
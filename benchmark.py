@@ -0,0 +1,238 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+
+from openpyxl import Workbook
+
+import source_reader
+from identity import resolve_employee_names
+from merge_alternate import build_month_frame, list_month_files
+from merged_store import combine_month_frames, load_merged_data, merged_store_path, write_merged_store
+from merged_writer import register_merge_styles, write_merged_sheet
+from report_engine import build_employee_tables, clean_employee_names, employee_totals, february_rows
+from report_writer import report_template, write_report_batch, zip_folder
+from schema import EXCLUDE_COLUMNS, NUMERIC_COLUMNS
+from summary import summary_rows_from_totals, write_summary_workbook
+from synthetic_data import DEFAULT_EMPLOYEES, DEFAULT_FILES, DEFAULT_HEADER_ROW, DEFAULT_MONTHS, generate_school
+
+# Stage benchmarks on a synthetic school (synthetic_data.py).
+# Each stage is timed on its own, with its input prepared beforehand:
+#
+# header_detection  - SR.NO row lookup in every opened source sheet
+# xls_parse         - read_source_file() of every source file (no parse cache)
+# merged_write      - merged monthly workbook plus its Parquet copy
+# merged_load       - load_merged_data() from the Parquet copy
+# merged_load_xlsx  - load_merged_data() from the workbook alone
+# reports           - employee tables and report files
+# summary           - employee totals and the summary workbook
+# zip               - ZIP of the report folder, as the app offers it
+#
+# Every stage runs --repeat times; the JSON result keeps all timings and the
+# best one, and --compare prints the change against an earlier result.
+
+# ===== CONFIGURATION =====
+# Usage: python benchmark.py [--employees N] [--months N] [--files N] [--repeat N] [--output FILE] [--compare FILE]
+# Example: python benchmark.py --employees 500 --output bench.json
+# Example: python benchmark.py --employees 500 --compare bench.json
+
+BENCH_SCHOOL = "bench_school"
+DEFAULT_REPEAT = 3
+DEFAULT_OUTPUT = "benchmark_results.json"
+
+
+def parse_args(argv=None):
+    """Parse the dataset size and benchmark options."""
+    parser = argparse.ArgumentParser(description="Time each pipeline stage on synthetic payroll data.")
+    parser.add_argument("--employees", type=int, default=DEFAULT_EMPLOYEES,
+                        help=f"Employees in the synthetic school (default: {DEFAULT_EMPLOYEES})")
+    parser.add_argument("--months", type=int, default=DEFAULT_MONTHS,
+                        help=f"Months of data (default: {DEFAULT_MONTHS})")
+    parser.add_argument("--files", type=int, default=DEFAULT_FILES,
+                        help=f".xls files per month (default: {DEFAULT_FILES})")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help=f"Runs per stage, best one reported (default: {DEFAULT_REPEAT})")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the dataset (default: 0)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT,
+                        help=f"JSON file for the results (default: {DEFAULT_OUTPUT})")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    parser.add_argument("--workdir", help="Folder for the dataset and outputs (default: a temp folder, removed afterwards)")
+    return parser.parse_args(argv)
+
+
+# ===== TIMING =====
+
+def time_stage(func, repeat, setup=None):
+    """
+    Run func() `repeat` times (setup() before each run, untimed).
+    Returns (seconds per run, result of the last run).
+    """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+
+def _reset_dir(path):
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
+
+# ===== STAGES =====
+
+def run_benchmarks(work_dir, employees=DEFAULT_EMPLOYEES, months=DEFAULT_MONTHS,
+                   files_per_month=DEFAULT_FILES, repeat=DEFAULT_REPEAT, seed=0):
+    """
+    Generate the synthetic school under work_dir and time every stage.
+    Returns {stage: {'seconds': [...], 'best': s, 'items': n, 'unit': what n counts}}.
+    """
+    file_count = generate_school(work_dir, BENCH_SCHOOL, employees, months, files_per_month,
+                                 DEFAULT_HEADER_ROW, seed)
+    month_files = list_month_files(os.path.join(work_dir, BENCH_SCHOOL))
+    paths = [path for _, files in month_files for path in files]
+    stages = {}
+
+    def record(name, timings, items, unit):
+        stages[name] = {'seconds': timings, 'best': min(timings), 'items': items, 'unit': unit}
+        print(f"  {name:<18} {min(timings):9.4f}s  ({items} {unit})")
+
+    print(f"Dataset: {employees} employees, {len(month_files)} months, {file_count} files")
+
+    # Header detection: sheets opened beforehand, the layout memo cleared per run
+    books = [source_reader.open_source_book(path) for path in paths]
+    timings, _ = time_stage(
+        lambda: [source_reader.find_header_row_in_sheet(book.sheet_by_index(0)) for book in books],
+        repeat, setup=source_reader._HEADER_LAYOUTS.clear,
+    )
+    record("header_detection", timings, len(paths), "files")
+
+    # Parse: the first file with its heading layout, like the merge
+    def parse_all():
+        return [source_reader.read_source_file(path, with_layout=(i == 0)) for i, path in enumerate(paths)]
+
+    timings, sources = time_stage(parse_all, repeat)
+    record("xls_parse", timings, len(paths), "files")
+
+    heading = sources[0]['heading']
+    column_styles = sources[0]['column_styles']
+    month_frames = []
+    offset = 0
+    for month, files in month_files:
+        month_sources = sources[offset:offset + len(files)]
+        month_frames.append((month, build_month_frame(files, month_sources)))
+        offset += len(files)
+
+    merged_file = os.path.join(work_dir, f"{BENCH_SCHOOL}_Merged_Monthly.xlsx")
+    store_file = merged_store_path(work_dir, BENCH_SCHOOL)
+
+    def write_merged():
+        wb = Workbook(write_only=True)
+        styles = register_merge_styles(wb, heading, column_styles)
+        for month, df in month_frames:
+            write_merged_sheet(wb, month, df, heading, styles)
+        wb.save(merged_file)
+        write_merged_store(store_file, combine_month_frames(month_frames))
+
+    timings, _ = time_stage(write_merged, repeat)
+    rows = sum(len(df) for _, df in month_frames)
+    record("merged_write", timings, rows, "rows")
+
+    timings, (df, _) = time_stage(lambda: load_merged_data(merged_file, store_file), repeat)
+    record("merged_load", timings, len(df), "rows")
+
+    missing_store = os.path.join(work_dir, "no_store.parquet")
+    timings, _ = time_stage(lambda: load_merged_data(merged_file, missing_store), repeat)
+    record("merged_load_xlsx", timings, len(df), "rows")
+
+    numeric_cols = [col for col in NUMERIC_COLUMNS if col in df.columns and col not in EXCLUDE_COLUMNS]
+    df = clean_employee_names(df)
+    df, _ = resolve_employee_names(df)
+
+    # Reports: compiled template warmed up first, as in a long-running process
+    report_template()
+    report_dir = os.path.join(work_dir, f"{BENCH_SCHOOL}_income_tax_reports")
+
+    def write_reports():
+        feb = february_rows(df)
+        totals = employee_totals(df, numeric_cols, feb=feb)
+        tables = build_employee_tables(df, numeric_cols, feb=feb, totals=totals)
+        written, failures = write_report_batch(tables, report_dir)
+        if failures:
+            raise RuntimeError(f"{len(failures)} reports failed, first: {failures[0]}")
+        return written
+
+    timings, written = time_stage(write_reports, repeat, setup=lambda: _reset_dir(report_dir))
+    record("reports", timings, len(written), "employees")
+
+    summary_file = os.path.join(work_dir, f"{BENCH_SCHOOL}_Summary_Totals.xlsx")
+
+    def write_summary():
+        summary_rows = summary_rows_from_totals(employee_totals(df, numeric_cols))
+        write_summary_workbook(summary_rows, numeric_cols, BENCH_SCHOOL, summary_file)
+        return summary_rows
+
+    timings, summary_rows = time_stage(write_summary, repeat)
+    record("summary", timings, len(summary_rows), "employees")
+
+    timings, archive = time_stage(lambda: zip_folder(report_dir), repeat)
+    record("zip", timings, archive.getbuffer().nbytes, "bytes")
+
+    return stages
+
+
+def compare_results(current, previous):
+    """Print the best time of every stage against an earlier result (ratio > 1 is slower)."""
+    print(f"\nCompared to {previous.get('created', 'earlier run')}:")
+    for name, stage in current['stages'].items():
+        before = previous.get('stages', {}).get(name)
+        if before is None:
+            print(f"  {name:<18} (new stage)")
+            continue
+        ratio = stage['best'] / before['best'] if before['best'] else float("inf")
+        print(f"  {name:<18} {before['best']:9.4f}s -> {stage['best']:9.4f}s  x{ratio:.2f}")
+    if previous.get('config') != current['config']:
+        print("  Note: dataset settings differ between the two runs")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    work_dir = args.workdir or tempfile.mkdtemp(prefix="report_gen_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        stages = run_benchmarks(work_dir, args.employees, args.months, args.files, args.repeat, args.seed)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    result = {
+        'created': datetime.now().isoformat(timespec="seconds"),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'config': {
+            'employees': args.employees, 'months': args.months, 'files_per_month': args.files,
+            'repeat': args.repeat, 'seed': args.seed,
+        },
+        'stages': stages,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"\n[SUCCESS] Results written: {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare_results(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
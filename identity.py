@@ -0,0 +1,348 @@
+import difflib
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+# Employee identity resolution for the merged payroll data.
+# Rows are grouped into one person by their SHALARTH ID / PAN NO / DCPS NO
+# when present. Rows without any ID are matched by name: first on a blocking
+# key of the sorted name tokens (spacing, dots and word order do not
+# matter), then by a fuzzy token comparison against the names sharing a
+# block with them: one of their tokens plus the initials of the others,
+# e.g. "PATIL MR" (blocks holding very many names are not compared). Every
+# row then gets the person's display name in EMPLOYEE NAME, so the existing
+# groupby on names sees one person.
+#
+# One person draws one salary line per bill: two groups that both have a
+# row in the same bill (Month + Source_File; a month folder may hold
+# several bills, each numbering its SR.NO from 1) are different people and
+# are never joined, whatever their IDs or names say. For the same reason
+# an ID value carried by two rows of one bill is a placeholder ("APPLIED",
+# a DDO's own PAN) and is ignored.
+
+ID_COLUMNS = ["SHALARTH ID", "PAN NO", "DCPS NO"]
+
+# Cell values that mean "no ID"
+MISSING_IDS = {
+    "", "NAN", "NONE", "NULL", "NA", "N/A", "NIL", "-", "0",
+    "APPLIED", "APPLIEDFOR", "PENDING", "NOTAVAILABLE", "NOTAPPLICABLE",
+}
+
+# Columns placing a row on a month's bill: Month + Source_File, and
+# Month + Source_File + SR.NO (SR.NO restarts in every bill of a month)
+SLOT_COLUMNS = [["Source_File"], ["Source_File", "SR.NO"]]
+
+MIN_BLOCK_TOKEN = 3      # tokens shorter than this do not form fuzzy blocks
+MAX_BLOCK_SIZE = 20      # blocks larger than this (very common names) are not compared
+TOKEN_SIMILARITY = 0.85  # difflib ratio for two spellings of the same token
+
+
+def normalize_id(value):
+    """ID cell as comparable text ("" when missing); whole-number floats lose their ".0"."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = "".join(str(value).split()).upper()
+    return "" if text in MISSING_IDS else text
+
+
+def name_tokens(name):
+    """Upper-cased name tokens, dots treated as spaces."""
+    return str(name).upper().replace(".", " ").split()
+
+
+def name_key(name):
+    """Blocking key of a name: its tokens sorted, so "PATIL  RAVI" and "RAVI PATIL" agree."""
+    return " ".join(sorted(name_tokens(name)))
+
+
+def name_blocks(tokens):
+    """
+    Fuzzy blocks of a token list: each token of MIN_BLOCK_TOKEN letters or
+    more with the sorted initials of the other tokens ("PATIL MR" for
+    "PATIL RAVI MOHANRAO"). Returns (own blocks, blocks of the name with one
+    other token left out), the latter for names of three tokens or more.
+    """
+    own, dropped = set(), set()
+    for i, token in enumerate(tokens):
+        if len(token) < MIN_BLOCK_TOKEN:
+            continue
+        initials = [other[0] for j, other in enumerate(tokens) if j != i]
+        own.add(f"{token} {''.join(sorted(initials))}".rstrip())
+        if len(tokens) >= 3:
+            for k in range(len(initials)):
+                dropped.add(f"{token} {''.join(sorted(initials[:k] + initials[k + 1:]))}")
+    return own, dropped
+
+
+def tokens_match(a, b):
+    """
+    Same name token: equal, an initial of the other, or a close spelling of
+    it starting with the same letter ("MOHANRAO" is not "SOHANRAO").
+    """
+    if a == b:
+        return True
+    if a[0] != b[0]:
+        return False
+    if len(a) == 1 or len(b) == 1:
+        return True
+    shorter, longer = sorted((len(a), len(b)))
+    # difflib's ratio is at most 2 * shorter / (shorter + longer)
+    if shorter < 4 or 2 * shorter < TOKEN_SIMILARITY * (shorter + longer):
+        return False
+    return _similar_spelling(min(a, b), max(a, b))
+
+
+@lru_cache(maxsize=1 << 18)
+def _similar_spelling(a, b):
+    return difflib.SequenceMatcher(None, a, b).ratio() >= TOKEN_SIMILARITY
+
+
+def names_match(a, b):
+    """
+    Token lists of the same person: every token of the shorter name matches
+    a different token of the longer one, with at most one token missing
+    (e.g. a dropped father's name) and at least one full-word match.
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    if len(b) - len(a) > 1 or (len(a) < 2 and len(b) > len(a)):
+        return False
+
+    remaining = list(b)
+    full_word = False
+    unmatched = []
+    for token in a:
+        if token in remaining:
+            remaining.remove(token)
+            full_word = full_word or len(token) > 1
+        else:
+            unmatched.append(token)
+    for token in unmatched:
+        match = next((other for other in remaining if tokens_match(token, other)), None)
+        if match is None:
+            return False
+        remaining.remove(match)
+        full_word = full_word or (len(token) > 1 and len(match) > 1)
+    return full_word
+
+
+class _Groups:
+    """
+    Union-find over record numbers; a group holds at most one ID identity
+    and never two rows of the same bill slot.
+    """
+
+    def __init__(self, size, has_id, slots=None):
+        self.parent = list(range(size))
+        self.id_root = [i if has_id[i] else None for i in range(size)]
+        self.slots = [set(s) for s in slots] if slots is not None else [set() for _ in range(size)]
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j, allow_two_ids=False):
+        """
+        Join two groups; refused when both have a row in the same bill slot,
+        or both already hold a (different) ID identity.
+        """
+        ri, rj = self.find(i), self.find(j)
+        if ri == rj:
+            return True
+        if not allow_two_ids and self.id_root[ri] is not None and self.id_root[rj] is not None:
+            return False
+        if not self.slots[ri].isdisjoint(self.slots[rj]):
+            return False
+        if len(self.slots[ri]) < len(self.slots[rj]):
+            ri, rj = rj, ri
+        self.parent[rj] = ri
+        if self.id_root[ri] is None:
+            self.id_root[ri] = self.id_root[rj]
+        self.slots[ri] |= self.slots[rj]
+        self.slots[rj] = set()
+        return True
+
+
+def _resolve_records(names, ids, slots=None):
+    """
+    Group number per record (distinct name + IDs combination).
+    names: cleaned names, ids: list of normalized ID tuples, slots: the
+    bill slots (see row_slots) each record's rows occupy.
+    """
+    n = len(names)
+    has_id = [any(values) for values in ids]
+    groups = _Groups(n, has_id, slots)
+
+    # 1. Records sharing any ID value are one person (unless they share a bill slot)
+    first_with = {}
+    for rec, values in enumerate(ids):
+        for col, value in zip(ID_COLUMNS, values):
+            if value:
+                other = first_with.setdefault((col, value), rec)
+                groups.union(other, rec, allow_two_ids=True)
+
+    # 2. Name-only records join the single ID person with the same blocking key
+    keys = [name_key(name) for name in names]
+    id_roots_by_key = {}
+    for rec in range(n):
+        if has_id[rec]:
+            id_roots_by_key.setdefault(keys[rec], set()).add(groups.find(rec))
+
+    first_by_key = {}
+    for rec in range(n):
+        if has_id[rec]:
+            continue
+        other = first_by_key.setdefault(keys[rec], rec)
+        groups.union(other, rec)
+        roots = id_roots_by_key.get(keys[rec], set())
+        if len(roots) == 1:
+            groups.union(next(iter(roots)), rec)
+
+    # 3. Remaining name-only groups: fuzzy match within their blocks
+    recs_by_key = {}
+    for rec in range(n):
+        recs_by_key.setdefault(keys[rec], []).append(rec)
+    key_blocks = {key: name_blocks(key.split()) for key in recs_by_key}
+    own_index, dropped_index = {}, {}
+    for key, (own_blocks, dropped_blocks) in key_blocks.items():
+        for block in own_blocks:
+            own_index.setdefault(block, []).append(key)
+        for block in dropped_blocks:
+            dropped_index.setdefault(block, []).append(key)
+
+    def block_members(index, block_set):
+        members = set()
+        for block in block_set:
+            keys_in_block = index.get(block, ())
+            if len(keys_in_block) <= MAX_BLOCK_SIZE:
+                members.update(keys_in_block)
+        return members
+
+    for key, recs in recs_by_key.items():
+        if key in id_roots_by_key:
+            continue
+        tokens = key.split()
+        own_blocks, dropped_blocks = key_blocks[key]
+        # Names of the same length, one token longer, one token shorter
+        others = (
+            block_members(own_index, own_blocks)
+            | block_members(dropped_index, own_blocks)
+            | block_members(own_index, dropped_blocks)
+        )
+        others.discard(key)
+
+        matches = [rec for other in others if names_match(tokens, other.split()) for rec in recs_by_key[other]]
+        for own in {groups.find(rec) for rec in recs}:
+            candidates = {groups.find(rec) for rec in matches}
+            candidates.discard(own)
+            # Only an unambiguous match is merged
+            if len(candidates) == 1:
+                groups.union(candidates.pop(), own)
+
+    return [groups.find(rec) for rec in range(n)]
+
+
+def row_slots(df):
+    """
+    Bill slots of every row: "month|file" and "month|file|sr_no" keys (just
+    the month when the frame has neither column). Returns one object array
+    per kind of key, None where the row has none of its columns.
+    """
+    if "Month" not in df.columns:
+        return []
+    months = df["Month"].astype(str)
+    if not any(col in df.columns for cols in SLOT_COLUMNS for col in cols):
+        return [months.to_numpy(dtype=object)]
+
+    slots = []
+    for cols in SLOT_COLUMNS:
+        keys = months
+        present = pd.Series(False, index=df.index)
+        for col in cols:
+            values = df[col].astype(object) if col in df.columns else pd.Series("", index=df.index)
+            present |= values.notna() & (values.astype(str).str.strip() != "")
+            keys = keys + f"|{col}|" + values.map(normalize_id).astype(str)
+        slots.append(keys.where(present, None).to_numpy(dtype=object))
+    return slots
+
+
+def placeholder_ids(values, slots):
+    """ID values that two rows of the same bill slot both carry (so they identify no one)."""
+    placeholders = set()
+    for slot in slots:
+        pairs = pd.DataFrame({"id": values, "slot": slot})
+        pairs = pairs[(pairs["id"] != "") & pairs["slot"].notna()]
+        placeholders.update(pairs.loc[pairs.duplicated(keep=False), "id"])
+    return placeholders
+
+
+def resolve_employee_names(df, emp_col="EMPLOYEE NAME"):
+    """
+    Give every row the display name of the person it belongs to (see the
+    module comment). The display name is the person's most frequent
+    spelling; two different people (different IDs) with the same name get
+    their first ID appended, e.g. "PATIL RAVI (SH001)".
+
+    Expects names already cleaned (clean_employee_names). Returns the frame
+    and a {original name: resolved name} map of the names that changed.
+    """
+    if df.empty:
+        return df, {}
+
+    id_cols = [col for col in ID_COLUMNS if col in df.columns]
+    names = df[emp_col].astype(str).to_numpy()
+    id_values = [df[col].astype(object).map(normalize_id).to_numpy() for col in id_cols]
+    slots = row_slots(df)
+    for i, values in enumerate(id_values):
+        placeholders = placeholder_ids(values, slots)
+        if placeholders:
+            id_values[i] = np.where(pd.Series(values).isin(placeholders).to_numpy(), "", values)
+
+    # One record per distinct name + IDs combination
+    parts = [names] + id_values
+    records = pd.DataFrame({i: part for i, part in enumerate(parts)})
+    codes = records.groupby(list(records.columns), sort=False).ngroup().to_numpy()
+    firsts = pd.Series(np.arange(len(codes))).groupby(codes).first().to_numpy()
+
+    rec_names = names[firsts].tolist()
+    rec_ids = [
+        tuple(id_values[id_cols.index(col)][pos] if col in id_cols else "" for col in ID_COLUMNS)
+        for pos in firsts
+    ]
+    rec_slots = [set() for _ in firsts]
+    for slot in slots:
+        for code, key in zip(codes, slot):
+            if key is not None:
+                rec_slots[code].add(key)
+    rec_group = np.asarray(_resolve_records(rec_names, rec_ids, rec_slots))
+    row_group = rec_group[codes]
+
+    # Display name: most frequent spelling of the person (first seen on ties)
+    spelling = pd.DataFrame({"group": row_group, "name": names, "pos": np.arange(len(names))})
+    counts = spelling.groupby(["group", "name"], sort=False).agg(rows=("pos", "size"), first=("pos", "min"))
+    counts = counts.reset_index().sort_values(["group", "rows", "first"], ascending=[True, False, True])
+    display = counts.drop_duplicates("group").set_index("group")["name"]
+
+    # Different people sharing a display name are told apart by their ID
+    clashes = display[display.duplicated(keep=False)]
+    if len(clashes):
+        first_id = {}
+        for rec, group in enumerate(rec_group):
+            if group in clashes.index and group not in first_id:
+                first_id[group] = next((value for value in rec_ids[rec] if value), "")
+        for group in clashes.index:
+            if first_id.get(group):
+                display[group] = f"{display[group]} ({first_id[group]})"
+
+    resolved = display.reindex(row_group).to_numpy()
+    changed = {
+        old: new for old, new in zip(names, resolved) if old != new
+    }
+
+    df = df.copy()
+    df[emp_col] = resolved
+    return df, changed
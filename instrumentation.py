@@ -0,0 +1,194 @@
+import os
+import sys
+import json
+import time
+import tracemalloc
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+
+# Per-stage timing and memory records of a run (merge, reports, summary,
+# the app). Code marks its stages with `with stage("name") as items:` and
+# fills items with what it processed (files, rows, employees, bytes);
+# outside a run_record() the marks cost next to nothing and record nothing.
+#
+# Each stage records wall time, process CPU time, resident memory after
+# the stage and the process peak so far, and, when the run traces memory,
+# the tracemalloc peak while the stage ran. The run lives in a context
+# variable, so concurrent Streamlit sessions keep separate records and
+# threads started with copy_context() (pipeline.run_stages) report into
+# the run that started them. CPU time and tracemalloc peaks are process
+# wide: stages that overlap share them, and worker processes are not counted.
+
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:
+    HAS_RESOURCE = False
+
+MB = 1024 * 1024
+
+_CURRENT_RUN = contextvars.ContextVar("report_gen_run", default=None)
+
+
+def _rss_bytes():
+    """(current RSS, peak RSS so far) of this process in bytes; None where unavailable."""
+    rss = peak = None
+    if HAS_PSUTIL:
+        info = psutil.Process().memory_info()
+        rss = info.rss
+        peak = getattr(info, "peak_wset", None)
+    if peak is None and HAS_RESOURCE:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        peak = max_rss if sys.platform == "darwin" else max_rss * 1024
+    if rss is not None and peak is not None:
+        peak = max(peak, rss)
+    return rss, peak
+
+
+def _mb(value):
+    return None if value is None else round(value / MB, 1)
+
+
+@contextmanager
+def run_record(label, trace_memory=False):
+    """
+    Collect the stages run inside the block into a run dict (label, start
+    time, stages). trace_memory=True also tracks Python allocations with
+    tracemalloc, which slows the run down noticeably.
+    """
+    run = {'label': label, 'started': datetime.now().isoformat(timespec="seconds"), 'stages': []}
+    token = _CURRENT_RUN.set(run)
+
+    tracing = trace_memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        yield run
+    finally:
+        run['wall_s'] = round(time.perf_counter() - start, 3)
+        if tracing:
+            tracemalloc.stop()
+        _CURRENT_RUN.reset(token)
+
+
+@contextmanager
+def stage(name, **items):
+    """
+    Record one stage of the current run. Yields the stage's items dict, to
+    be filled with the counts it processed; keyword arguments seed it.
+    """
+    run = _CURRENT_RUN.get()
+    if run is None:
+        yield dict(items)
+        return
+
+    record = {'stage': name, 'items': dict(items)}
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    try:
+        yield record['items']
+    except BaseException:
+        record['failed'] = True
+        raise
+    finally:
+        record['wall_s'] = round(time.perf_counter() - wall, 3)
+        record['cpu_s'] = round(time.process_time() - cpu, 3)
+        rss, peak = _rss_bytes()
+        record['rss_mb'] = _mb(rss)
+        record['peak_rss_mb'] = _mb(peak)
+        if tracing:
+            record['tracemalloc_peak_mb'] = _mb(tracemalloc.get_traced_memory()[1])
+        run['stages'].append(record)
+
+
+def file_bytes(*paths):
+    """Total size of the given files (missing ones count as 0)."""
+    return sum(os.path.getsize(path) for path in paths if path and os.path.exists(path))
+
+
+def folder_bytes(folder):
+    """Total size of the files in a folder tree."""
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(folder)
+        for name in files
+    )
+
+
+# ===== OUTPUT =====
+
+def _items_text(items):
+    return ", ".join(f"{key} {value:,}" if isinstance(value, int) else f"{key} {value}" for key, value in items.items())
+
+
+def stage_rows(run):
+    """One flat dict per stage (for tables): Stage, Wall s, CPU s, RSS MB, Peak RSS MB[, Traced peak MB], Items."""
+    rows = []
+    for record in run['stages']:
+        row = {
+            "Stage": record['stage'] + (" (failed)" if record.get('failed') else ""),
+            "Wall s": record['wall_s'],
+            "CPU s": record['cpu_s'],
+            "RSS MB": record['rss_mb'],
+            "Peak RSS MB": record['peak_rss_mb'],
+        }
+        if 'tracemalloc_peak_mb' in record:
+            row["Traced peak MB"] = record['tracemalloc_peak_mb']
+        row["Items"] = _items_text(record['items'])
+        rows.append(row)
+    return rows
+
+
+def _cell_text(key, value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.3f}" if key.endswith(" s") else f"{value:.1f}"
+    return str(value)
+
+
+def format_stage_table(run):
+    """The stages of a run as a plain-text table for the console."""
+    rows = stage_rows(run)
+    if not rows:
+        return f"{run['label']}: no stages recorded"
+
+    headers = list(dict.fromkeys(key for row in rows for key in row))
+    cells = [[_cell_text(key, row.get(key)) for key in headers] for row in rows]
+    widths = [max(len(header), *(len(line[i]) for line in cells)) for i, header in enumerate(headers)]
+
+    def line(values):
+        return "  ".join(
+            value.ljust(width) if i in (0, len(widths) - 1) else value.rjust(width)
+            for i, (value, width) in enumerate(zip(values, widths))
+        ).rstrip()
+
+    out = [f"Stage timings - {run['label']} ({run.get('wall_s', 0)}s total)", line(headers), line(["-" * w for w in widths])]
+    out.extend(line(values) for values in cells)
+    return "\n".join(out)
+
+
+def write_run_record(run, path):
+    """Write the run (every stage with its measurements) as JSON."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=2)
+
+
+def finish_run(run, record_file=None):
+    """End of a CLI run: print the stage table and write the JSON record if asked for."""
+    print("\n" + format_stage_table(run))
+    if record_file:
+        write_run_record(run, record_file)
+        print(f"Run record: {record_file}")
@@ -1,255 +1,316 @@
 import pandas as pd
 import os
-import sys
 import glob
-import xlrd
-from openpyxl import Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from openpyxl import Workbook, load_workbook
 from openpyxl.utils import get_column_letter
 
+from instrumentation import file_bytes, finish_run, run_record, stage
+from parse_cache import content_key, default_cache_dir, prune_cache, read_source_file_cached
+from merged_writer import register_merge_styles, table_rows, write_merged_sheet
+from merged_store import (
+    combine_month_frames, load_manifest, merged_store_is_fresh, merged_store_path,
+    read_merged_store, save_manifest, write_merged_store,
+)
+
 # ===== CONFIGURATION =====
-# Usage: python merge_alternate.py [folder_name]
+# Usage: python merge_alternate.py [folder_name] [--workers N] [--append]
 # Example: python merge_alternate.py palasgaon
-# Example: python merge_alternate.py "KANYA BASMATH"
+# Example: python merge_alternate.py "KANYA BASMATH" --workers 8
+# Example: python merge_alternate.py palasgaon --append   (only rebuild changed months)
+# Example: python merge_alternate.py palasgaon --run-record merge_run.json   (stage timings as JSON)
 
 ROOT_DIR = os.environ.get("EXCEL_MERGER_ROOT", r"D:\excel merger")
 
-# Get folder name from command line or use default
-if len(sys.argv) > 1:
-    SCHOOL_FOLDER = sys.argv[1]
-else:
-    SCHOOL_FOLDER = "palasgaon"  # Default
-
-BASE_PATH = os.path.join(ROOT_DIR, SCHOOL_FOLDER)
-OUTPUT_FILE = os.path.join(ROOT_DIR, f"{SCHOOL_FOLDER}_Merged_Monthly.xlsx")
-
-print(f"School: {SCHOOL_FOLDER}")
-print(f"Source: {BASE_PATH}")
-print(f"Output: {OUTPUT_FILE}")
-
-
-def find_header_row(file_path):
-    preview = pd.read_excel(
-        file_path,
-        engine="xlrd",
-        header=None,
-        nrows=40
-    )
-
-    for i, row in preview.iterrows():
-        if row.astype(str).str.upper().isin(["SR.NO"]).any():
-            return i
 
-    raise ValueError(f"SR.NO not found in {file_path}")
-
-
-def copy_heading_from_source(source_file, dest_ws, header_row):
+def parse_args(argv=None):
+    """Parse the school folder name and ingest options."""
+    parser = argparse.ArgumentParser(description="Merge monthly .xls files into one workbook.")
+    parser.add_argument("folder", nargs="?", default="palasgaon",
+                        help="School folder under EXCEL_MERGER_ROOT")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Parse source files in N worker processes (default: 1)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Parse every file again instead of using the parse cache")
+    parser.add_argument("--append", action="store_true",
+                        help="Update the existing merged workbook, rebuilding only months whose files changed")
+    parser.add_argument("--run-record", metavar="FILE",
+                        help="Also write the stage timings of the run to FILE as JSON")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Track Python allocations per stage (tracemalloc; slower)")
+    return parser.parse_args(argv)
+
+
+def copy_heading_from_source(heading, dest_ws, styles):
     """
     Copy heading rows exactly as they are from source .xls file.
     Preserves cell positions, merged cells, and formatting.
+    Used for sheets added to an existing workbook (--append).
     """
-    source_wb = xlrd.open_workbook(source_file, formatting_info=True)
-    source_sheet = source_wb.sheet_by_index(0)
-    
-    # Copy cells from heading rows
-    for row_idx in range(header_row):
-        for col_idx in range(source_sheet.ncols):
-            cell = source_sheet.cell(row_idx, col_idx)
-            value = cell.value
-            
-            if value == '' or value is None:
-                continue
-            
-            # Get formatting
-            xf_index = cell.xf_index
-            xf = source_wb.xf_list[xf_index]
-            font = source_wb.font_list[xf.font_index]
-            
-            # Write to destination (1-indexed)
-            dest_cell = dest_ws.cell(row=row_idx + 1, column=col_idx + 1, value=value)
-            
-            # Apply font
-            font_size = font.height // 20
-            if font_size < 8:
-                font_size = 11
-            
-            dest_cell.font = Font(
-                name=font.name if font.name else 'Calibri',
-                size=font_size,
-                bold=font.bold,
-                italic=font.italic
-            )
-            
-            # Alignment
-            h_align_map = {0: 'general', 1: 'left', 2: 'center', 3: 'right'}
-            h_align = h_align_map.get(xf.alignment.hor_align, 'general')
-            dest_cell.alignment = Alignment(horizontal=h_align, vertical='center')
-    
-    # Copy merged cells
-    for (rlo, rhi, clo, chi) in source_sheet.merged_cells:
-        if rlo < header_row:
-            dest_ws.merge_cells(
-                start_row=rlo + 1,
-                start_column=clo + 1,
-                end_row=min(rhi, header_row),
-                end_column=chi
-            )
-    
-    # Copy column widths
-    for col_idx in range(source_sheet.ncols):
-        col_width = source_sheet.colinfo_map.get(col_idx)
-        if col_width:
-            width = col_width.width / 256
-            dest_ws.column_dimensions[get_column_letter(col_idx + 1)].width = width
-    
-    # Copy row heights
-    for row_idx in range(header_row):
-        row_height = source_sheet.rowinfo_map.get(row_idx)
-        if row_height:
-            dest_ws.row_dimensions[row_idx + 1].height = row_height.height / 20
-    
-    return header_row
+    header_row = heading['header_row']
 
+    # Copy cells from heading rows (1-indexed), font/alignment via named styles
+    for info, style in zip(heading['cells'], styles['heading']):
+        dest_cell = dest_ws.cell(row=info['row'] + 1, column=info['col'] + 1, value=info['value'])
+        dest_cell.style = style
 
-def get_column_header_styles(source_file, header_row):
-    """Extract column header styles from source file."""
-    workbook = xlrd.open_workbook(source_file, formatting_info=True)
-    sheet = workbook.sheet_by_index(0)
-    
-    styles = []
-    for col_idx in range(sheet.ncols):
-        cell = sheet.cell(header_row, col_idx)
-        xf_index = cell.xf_index
-        xf = workbook.xf_list[xf_index]
-        font = workbook.font_list[xf.font_index]
-        
-        # Background color
-        pattern_colour_index = xf.background.pattern_colour_index
-        bg_color = None
-        if pattern_colour_index and pattern_colour_index < len(workbook.colour_map):
-            rgb = workbook.colour_map.get(pattern_colour_index)
-            if rgb:
-                bg_color = '{:02X}{:02X}{:02X}'.format(*rgb)
-        
-        styles.append({
-            'bold': font.bold,
-            'italic': font.italic,
-            'font_size': font.height // 20,
-            'font_name': font.name,
-            'bg_color': bg_color,
-        })
-    
-    return styles
-
-
-def apply_cell_style(cell, style_info=None, is_header=False):
-    """Apply style to cell."""
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    cell.border = thin_border
-    
-    if is_header and style_info:
-        font_size = style_info.get('font_size', 11)
-        if font_size < 8:
-            font_size = 11
-        
-        cell.font = Font(
-            name=style_info.get('font_name', 'Calibri'),
-            size=font_size,
-            bold=style_info.get('bold', True),
-            italic=style_info.get('italic', False)
+    # Copy merged cells
+    for (rlo, rhi, clo, chi) in heading['merged']:
+        dest_ws.merge_cells(
+            start_row=rlo + 1,
+            start_column=clo + 1,
+            end_row=min(rhi, header_row),
+            end_column=chi
         )
-        cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        
-        bg_color = style_info.get('bg_color')
-        if bg_color:
-            cell.fill = PatternFill(start_color=bg_color, end_color=bg_color, fill_type='solid')
-    elif is_header:
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
 
+    # Copy column widths
+    for col_idx, width in heading['col_widths'].items():
+        dest_ws.column_dimensions[get_column_letter(col_idx + 1)].width = width
 
-# =================== MAIN PROCESSING ===================
+    # Copy row heights
+    for row_idx, height in heading['row_heights'].items():
+        dest_ws.row_dimensions[row_idx + 1].height = height
 
-wb = Workbook()
-wb.remove(wb.active)  # remove default sheet
+    return header_row
 
-# Get heading/styles from first file found
-first_file = None
-header_row_first = None
-column_styles = None
 
-print("Processing monthly sheets...")
+def list_month_files(base_path):
+    """Month folders (sorted) with their .xls files, skipping empty months."""
+    month_files = []
+    for month in sorted(os.listdir(base_path)):
+        month_path = os.path.join(base_path, month)
 
-for month in sorted(os.listdir(BASE_PATH)):
-    month_path = os.path.join(BASE_PATH, month)
+        if not os.path.isdir(month_path):
+            continue
 
-    if not os.path.isdir(month_path):
-        continue
+        files = glob.glob(os.path.join(month_path, "*.xls"))
+        if not files:
+            continue
 
-    files = glob.glob(os.path.join(month_path, "*.xls"))
-    if not files:
-        continue
+        month_files.append((month, files))
+    return month_files
 
-    month_tables = []
 
-    for file in files:
-        header_row = find_header_row(file)
-
-        # Save first file info
-        if first_file is None:
-            first_file = file
-            header_row_first = header_row
-            column_styles = get_column_header_styles(file, header_row)
-            print(f"Using heading from: {os.path.basename(file)}")
-
-        df = pd.read_excel(
-            file,
-            engine="xlrd",
-            header=header_row
-        )
+def read_month_sources(month_files, workers=1, cache_dir=None, layout_first=True):
+    """
+    Parse every source file and yield (month, files, sources) month by month.
 
-        df = df.dropna(how="all")
+    With workers > 1 the files are parsed in a process pool; results come
+    back in submission order, so the month sheets are assembled exactly as
+    in a sequential run. The very first file also supplies heading/styles
+    (unless layout_first=False). Files already in the parse cache (same
+    bytes) are not parsed again.
+    """
+    all_files = [file for _, files in month_files for file in files]
+    with_layout = [layout_first and idx == 0 for idx in range(len(all_files))]
+    read_source = partial(read_source_file_cached, cache_dir=cache_dir)
+
+    if workers > 1 and len(all_files) > 1:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        chunksize = max(1, len(all_files) // (workers * 4))
+        results = pool.map(read_source, all_files, with_layout, chunksize=chunksize)
+    else:
+        pool = None
+        results = map(read_source, all_files, with_layout)
+
+    try:
+        for month, files in month_files:
+            yield month, files, [next(results) for _ in files]
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def month_digests(files):
+    """Content hash of every file in a month, keyed by file name."""
+    digests = {}
+    for file in files:
+        with open(file, "rb") as f:
+            digests[os.path.basename(file)] = content_key(f.read())
+    return digests
 
-        # Remove Grand Total
-        if "SR.NO" in df.columns:
-            df = df[df["SR.NO"].astype(str).str.upper() != "GRAND TOTAL"]
 
+def build_month_frame(files, sources):
+    """Concatenate the parsed files of one month, tagging each row with its file."""
+    month_tables = []
+    for file, source in zip(files, sources):
+        df = source['data']
         df["Source_File"] = os.path.basename(file)
         month_tables.append(df)
+    return pd.concat(month_tables, ignore_index=True)
 
-    final_month_df = pd.concat(month_tables, ignore_index=True)
 
-    # Create sheet for this month
-    ws = wb.create_sheet(title=month)
+def write_month_sheet(wb, month, final_month_df, heading, styles, index=None):
+    """Add one month sheet to a regular (loaded) workbook: heading, blank row, table."""
+    ws = wb.create_sheet(title=month, index=index)
 
     # Copy heading exactly from first source file
-    heading_rows = copy_heading_from_source(first_file, ws, header_row_first)
+    heading_rows = copy_heading_from_source(heading, ws, styles)
 
     # Blank row after heading
     current_row = heading_rows + 2
 
     # Write table data
-    for r_idx, r in enumerate(dataframe_to_rows(final_month_df, index=False, header=True)):
-        for c_idx, value in enumerate(r, start=1):
-            cell = ws.cell(row=current_row, column=c_idx, value=value)
-            
-            if r_idx == 0:  # Header row
-                style = column_styles[c_idx - 1] if c_idx <= len(column_styles) else None
-                apply_cell_style(cell, style, is_header=True)
+    for r_idx, row in enumerate(table_rows(ws, final_month_df, styles)):
+        for c_idx, cell in enumerate(row, start=1):
+            ws.cell(row=current_row + r_idx, column=c_idx, value=cell.value).style = cell.style
+
+    return ws
+
+
+# =================== MAIN PROCESSING ===================
+
+def merge(school_folder, root_dir=ROOT_DIR, workers=1, use_cache=True, append=False, cache_dir=None):
+    """
+    Merge the monthly .xls files of root_dir/school_folder into
+    {school_folder}_Merged_Monthly.xlsx (one sheet per month) plus its
+    columnar copy. With append=True only months whose files changed since
+    the last run are rebuilt. cache_dir overrides the parse cache folder.
+
+    Returns a dict with the merged workbook path ('output_file') and the
+    merged rows as one frame ('data', as load_merged_data() would read them
+    before the schema; None when the workbook was already up to date).
+    """
+    base_path = os.path.join(root_dir, school_folder)
+    output_file = os.path.join(root_dir, f"{school_folder}_Merged_Monthly.xlsx")
+    store_file = merged_store_path(root_dir, school_folder)
+    manifest_file = os.path.join(root_dir, f"{school_folder}_Merged_Monthly.manifest.json")
+
+    print(f"School: {school_folder}")
+    print(f"Source: {base_path}")
+    print(f"Output: {output_file}")
+    if workers > 1:
+        print(f"Workers: {workers}")
+
+    if not use_cache:
+        cache_dir = None
+    elif cache_dir is None:
+        cache_dir = default_cache_dir(root_dir)
+
+    month_files = list_month_files(base_path)
+    if not month_files:
+        raise ValueError(f"No month folders with .xls files found in {base_path}")
+
+    digests = {month: month_digests(files) for month, files in month_files}
+
+    # Heading/styles always come from the first file found
+    first_file = month_files[0][1][0]
+    heading_key = [os.path.relpath(first_file, base_path), digests[month_files[0][0]][os.path.basename(first_file)]]
+
+    # --append: keep the sheets of months whose files are unchanged since the last run
+    wb = None
+    stale_months = [month for month, _ in month_files]
+    manifest = load_manifest(manifest_file) if append else None
+
+    if manifest and manifest.get("heading") == heading_key and os.path.exists(output_file):
+        wb = load_workbook(output_file)
+        previous = manifest.get("months", {})
+        stale_months = [
+            month for month, _ in month_files
+            if previous.get(month) != digests[month] or month not in wb.sheetnames
+        ]
+        for title in list(wb.sheetnames):
+            if title not in digests or title in stale_months:
+                wb.remove(wb[title])
+        print(f"Appending: {len(stale_months)} of {len(month_files)} months changed")
+    elif append:
+        print("Appending: no usable manifest/workbook, rebuilding all months")
+
+    # Full builds stream each sheet through a write-only workbook
+    appending = wb is not None
+    if not appending:
+        wb = Workbook(write_only=True)
+
+    stale_files = [(month, files) for month, files in month_files if month in stale_months]
+    rebuilt = {}
+    heading = None
+    column_styles = None
+    styles = None
+
+    if stale_files and stale_files[0][1][0] != first_file:
+        first_source = read_source_file_cached(first_file, with_layout=True, cache_dir=cache_dir)
+        heading = first_source['heading']
+        column_styles = first_source['column_styles']
+
+    print("Processing monthly sheets...")
+
+    with stage("merge_sheets", files=sum(len(files) for _, files in stale_files), rows=0) as items:
+        sources_iter = read_month_sources(stale_files, workers, cache_dir, layout_first=heading is None)
+
+        for month, files, sources in sources_iter:
+            if heading is None:
+                heading = sources[0]['heading']
+                column_styles = sources[0]['column_styles']
+            if styles is None:
+                styles = register_merge_styles(wb, heading, column_styles)
+            if files[0] == first_file:
+                print(f"Using heading from: {os.path.basename(first_file)}")
+
+            final_month_df = build_month_frame(files, sources)
+            rebuilt[month] = final_month_df
+            items['rows'] += len(final_month_df)
+
+            if appending:
+                # Sheets stay in month folder order; earlier months are already in place
+                position = [m for m, _ in month_files].index(month)
+                write_month_sheet(wb, month, final_month_df, heading, styles, index=position)
             else:
-                apply_cell_style(cell)
-        
-        current_row += 1
+                write_merged_sheet(wb, month, final_month_df, heading, styles)
+
+            print(f"  [{month}] - {len(final_month_df)} rows from {len(files)} files")
+
+    for month in digests:
+        if month not in rebuilt:
+            print(f"  [{month}] - unchanged")
+
+    combined = None
+    if rebuilt or len(wb.sheetnames) != len(month_files) or not append:
+        # Unchanged months for the columnar copy come from the previous copy when it is current
+        kept = None
+        if len(rebuilt) < len(month_files) and merged_store_is_fresh(store_file, output_file):
+            kept = read_merged_store(store_file)
+
+        with stage("merged_write") as items:
+            wb.save(output_file)
+
+            # Typed columnar copy for report.py / summary.py (written after the xlsx so it is never older)
+            month_frames = []
+            for month, files in month_files:
+                if month in rebuilt:
+                    month_frames.append((month, rebuilt[month]))
+                elif kept is not None:
+                    month_frames.append((month, kept[kept["Month"] == month].reset_index(drop=True)))
+                else:
+                    sources = [read_source_file_cached(file, cache_dir=cache_dir) for file in files]
+                    month_frames.append((month, build_month_frame(files, sources)))
+
+            combined = combine_month_frames(month_frames)
+            if write_merged_store(store_file, combined):
+                print(f"Columnar copy: {store_file}")
+
+            items['rows'] = 0 if combined is None else len(combined)
+            items['bytes'] = file_bytes(output_file, store_file)
+
+        save_manifest(manifest_file, {"heading": heading_key, "months": digests})
+    else:
+        print("Merged workbook already up to date")
+
+    if cache_dir is not None:
+        prune_cache(cache_dir)
+
+    print(f"\n[SUCCESS] Monthly Excel created: {output_file}")
+    print(f"   Sheets: {len(wb.sheetnames)}")
+    return {'output_file': output_file, 'data': combined}
+
 
-    print(f"  [{month}] - {len(final_month_df)} rows from {len(files)} files")
+def main(argv=None):
+    args = parse_args(argv)
+    with run_record(f"merge {args.folder}", trace_memory=args.trace_memory) as run:
+        merge(args.folder, workers=args.workers, use_cache=not args.no_cache, append=args.append)
+    finish_run(run, args.run_record)
 
-wb.save(OUTPUT_FILE)
 
-print(f"\n[SUCCESS] Monthly Excel created: {OUTPUT_FILE}")
-print(f"   Sheets: {len(wb.sheetnames)}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import os
+import json
+import pandas as pd
+
+from schema import apply_schema
+
+# Parquet copy of the merged monthly data, written next to
+# {school}_Merged_Monthly.xlsx so report.py / summary.py can skip parsing
+# the styled workbook. Needs pyarrow; without it (or if the frame cannot be
+# stored) the artifact is skipped and the scripts read the xlsx as before.
+# load_merged_data() is the loader both stages share; the JSON manifests of
+# the merge and report runs are read and written here too.
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+TEXT_PREFIX = "__text__"
+MIXED_COLUMNS_KEY = b"report_gen.mixed_columns"
+
+
+def merged_store_path(root_dir, school_folder):
+    """Path of the columnar artifact for a school."""
+    return os.path.join(root_dir, f"{school_folder}_Merged_Monthly.parquet")
+
+
+def like_xlsx_read(df):
+    """
+    Give a month frame the dtypes it would have after a round trip through
+    the merged xlsx: whole-number floats come back as ints, so int-only
+    columns are int64 and mixed columns hold ints instead of floats.
+    """
+    df = df.copy()
+    for idx in range(df.shape[1]):
+        ser = df.iloc[:, idx]
+        if pd.api.types.is_float_dtype(ser):
+            if len(ser) and ser.notna().all() and (ser % 1 == 0).all():
+                df.isetitem(idx, ser.astype("int64"))
+        elif ser.dtype == object:
+            values = [
+                int(v) if isinstance(v, float) and v.is_integer() else v
+                for v in ser
+            ]
+            df.isetitem(idx, pd.Series(values, index=ser.index, dtype=object).infer_objects())
+    return df
+
+
+def _split_mixed(df):
+    """Split object columns mixing text and numbers into two typed columns."""
+    mixed = []
+    for col in list(df.columns):
+        ser = df[col]
+        if ser.dtype != object:
+            continue
+        is_text = ser.map(lambda v: isinstance(v, str)).astype(bool)
+        df[col] = pd.to_numeric(ser.where(~is_text), errors="coerce").astype("float64")
+        df[TEXT_PREFIX + col] = ser.where(is_text, None)
+        mixed.append(col)
+    return df, mixed
+
+
+def _join_mixed(df, mixed):
+    """Undo _split_mixed, restoring ints for whole-number values."""
+    for col in mixed:
+        text_col = TEXT_PREFIX + col
+        values = [
+            text if isinstance(text, str)
+            else int(num) if num == num and num.is_integer()
+            else num
+            for num, text in zip(df[col].astype("float64"), df[text_col].astype(object))
+        ]
+        df[col] = pd.Series(values, index=df.index, dtype=object)
+        df = df.drop(columns=[text_col])
+    return df
+
+
+def combine_month_frames(month_frames):
+    """
+    Month frames (in sheet order) as one frame with a Month column, in the
+    shape a read of the merged xlsx produces (None if there are none).
+    """
+    all_data = []
+    for month, df in month_frames:
+        df = like_xlsx_read(df)
+        if "Month" not in df.columns:
+            df["Month"] = month
+        all_data.append(df)
+
+    if not all_data:
+        return None
+    return pd.concat(all_data, ignore_index=True)
+
+
+def write_merged_store(path, combined):
+    """
+    Write the merged data (combine_month_frames()) as Parquet.
+    Returns True if the artifact was written.
+    """
+    if not HAS_PYARROW or combined is None:
+        return False
+
+    if combined.columns.duplicated().any() or not all(isinstance(c, str) for c in combined.columns):
+        print("[SKIP] Columnar copy not written (column names are not unique strings)")
+        return False
+
+    try:
+        combined, mixed = _split_mixed(combined.copy())
+        table = pyarrow.Table.from_pandas(combined, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[MIXED_COLUMNS_KEY] = json.dumps(mixed).encode()
+        table = table.replace_schema_metadata(metadata)
+
+        import pyarrow.parquet as pq
+        pq.write_table(table, path)
+    except (ValueError, TypeError, pyarrow.ArrowException) as e:
+        print(f"[SKIP] Columnar copy not written ({e})")
+        if os.path.exists(path):
+            os.remove(path)
+        return False
+
+    return True
+
+
+def merged_store_is_fresh(store_path, merged_file):
+    """True if the Parquet artifact exists and is not older than the xlsx."""
+    if not HAS_PYARROW or not os.path.exists(store_path):
+        return False
+    if not os.path.exists(merged_file):
+        return True
+    return os.path.getmtime(store_path) >= os.path.getmtime(merged_file)
+
+
+def read_merged_store(store_path):
+    """Load the combined frame written by write_merged_store()."""
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(store_path)
+    metadata = table.schema.metadata or {}
+    mixed = json.loads(metadata.get(MIXED_COLUMNS_KEY, b"[]"))
+
+    df = table.to_pandas()
+    return _join_mixed(df, mixed)
+
+
+# ===== LOADING =====
+
+def find_header_row_xlsx(file_path, sheet_name=0):
+    """Find the row containing SR.NO header in the merged xlsx file."""
+    preview = pd.read_excel(file_path, sheet_name=sheet_name, header=None, nrows=20)
+    for i, row in preview.iterrows():
+        if row.astype(str).str.upper().str.strip().isin(["SR.NO"]).any():
+            return i
+    return 0
+
+
+def load_merged_data(merged_file, store_file):
+    """
+    Load data from the merged Excel file (all sheets), typed by the schema.
+    Returns the frame and the report of coerced non-numeric cells.
+    """
+    # Prefer the typed columnar copy written by the merge (no xlsx parsing)
+    if merged_store_is_fresh(store_file, merged_file):
+        print(f"Reading {store_file}...")
+        combined_df = read_merged_store(store_file)
+        for month, count in combined_df.groupby("Month", sort=False).size().items():
+            print(f"  [{month}] - {count} rows")
+        print(f"\nTotal records: {len(combined_df)}")
+        return apply_schema(combined_df)
+
+    print(f"Reading {merged_file}...")
+
+    xlsx = pd.ExcelFile(merged_file)
+    sheet_names = xlsx.sheet_names
+    print(f"Found {len(sheet_names)} sheets: {sheet_names}")
+
+    all_data = []
+
+    for sheet_name in sheet_names:
+        header_row = find_header_row_xlsx(merged_file, sheet_name)
+        df = pd.read_excel(merged_file, sheet_name=sheet_name, header=header_row)
+        df = df.dropna(how="all")
+
+        if "Month" not in df.columns:
+            df["Month"] = sheet_name
+
+        all_data.append(df)
+        print(f"  [{sheet_name}] - {len(df)} rows")
+
+    combined_df = pd.concat(all_data, ignore_index=True)
+    print(f"\nTotal records: {len(combined_df)}")
+
+    return apply_schema(combined_df)
+
+
+def load_manifest(manifest_file):
+    """Read a JSON run manifest (None if missing or unreadable)."""
+    try:
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(manifest_file, manifest):
+    with open(manifest_file, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,175 @@
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, Border, Side, PatternFill, NamedStyle
+from openpyxl.styles.borders import DEFAULT_BORDER
+from openpyxl.styles.fills import DEFAULT_EMPTY_FILL
+from openpyxl.styles.fonts import DEFAULT_FONT
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.dataframe import dataframe_to_rows
+
+# Writers for the merged monthly workbooks on openpyxl write-only sheets.
+# Styles are registered once per workbook as named styles and cells only
+# reference them by name, so no Font/Border/Alignment is built per cell.
+
+THIN_BORDER = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+
+DEFAULT_COLUMN_WIDTH = 13  # openpyxl's width for a column dimension that was only looked at
+
+
+def add_named_style(wb, name, **attrs):
+    """
+    Register a named style once per workbook and return its name.
+    Attributes not given fall back to the workbook defaults, the same as a
+    cell that is formatted directly.
+    """
+    if name not in wb.named_styles:
+        attrs.setdefault('font', DEFAULT_FONT)
+        attrs.setdefault('border', DEFAULT_BORDER)
+        attrs.setdefault('fill', DEFAULT_EMPTY_FILL)
+        wb.add_named_style(NamedStyle(name=name, **attrs))
+    return name
+
+
+def register_merge_styles(wb, heading, column_styles):
+    """
+    Named styles for a merged sheet: one per distinct heading cell font,
+    one per distinct column header style, the default header and data.
+    """
+    names = {}
+
+    def style_for(key, prefix, **attrs):
+        if key not in names:
+            number = sum(1 for k in names if k[0] == key[0]) + 1
+            names[key] = add_named_style(wb, f"{prefix} {number}", **attrs)
+        return names[key]
+
+    heading_styles = []
+    for info in heading['cells']:
+        font_size = info['font_size']
+        if font_size < 8:
+            font_size = 11
+        font_name = info['font_name'] if info['font_name'] else 'Calibri'
+        key = ('heading', font_name, font_size, info['bold'], info['italic'], info['h_align'])
+        heading_styles.append(style_for(
+            key, "Merge Heading",
+            font=Font(name=font_name, size=font_size, bold=info['bold'], italic=info['italic']),
+            alignment=Alignment(horizontal=info['h_align'], vertical='center'),
+        ))
+
+    header_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
+    header_styles = []
+    for style_info in column_styles or []:
+        font_size = style_info.get('font_size', 11)
+        if font_size < 8:
+            font_size = 11
+        font_name = style_info.get('font_name', 'Calibri')
+        bold = style_info.get('bold', True)
+        italic = style_info.get('italic', False)
+        bg_color = style_info.get('bg_color')
+        key = ('header', font_name, font_size, bold, italic, bg_color)
+        attrs = {
+            'font': Font(name=font_name, size=font_size, bold=bold, italic=italic),
+            'alignment': header_align,
+            'border': THIN_BORDER,
+        }
+        if bg_color:
+            attrs['fill'] = PatternFill(start_color=bg_color, end_color=bg_color, fill_type='solid')
+        header_styles.append(style_for(key, "Merge Header", **attrs))
+
+    return {
+        'heading': heading_styles,
+        'header': header_styles,
+        'header_default': add_named_style(
+            wb, "Merge Header", font=Font(bold=True), alignment=header_align, border=THIN_BORDER
+        ),
+        'data': add_named_style(wb, "Merge Data", border=THIN_BORDER),
+    }
+
+
+def _styled(ws, value, style):
+    cell = WriteOnlyCell(ws, value=value)
+    cell.style = style
+    return cell
+
+
+def heading_rows(ws, heading, styles):
+    """
+    Rows of the copied heading block for a write-only sheet, with merges,
+    column widths and row heights registered on the sheet.
+    """
+    header_row = heading['header_row']
+
+    # Merged ranges as openpyxl would clip them: only the top-left cell keeps its value
+    merges = []
+    for (rlo, rhi, clo, chi) in heading['merged']:
+        end_row = min(rhi, header_row)
+        merges.append((rlo + 1, end_row, clo + 1, chi))
+        ws.merged_cells.add(
+            f"{get_column_letter(clo + 1)}{rlo + 1}:{get_column_letter(chi)}{end_row}"
+        )
+
+    def covered(row, col):
+        return any(
+            r1 <= row <= r2 and c1 <= col <= c2 and (row, col) != (r1, c1)
+            for (r1, r2, c1, c2) in merges
+        )
+
+    for row_idx, height in heading['row_heights'].items():
+        ws.row_dimensions[row_idx + 1].height = height
+
+    rows = [[] for _ in range(header_row)]
+    for info, style in zip(heading['cells'], styles['heading']):
+        row, col = info['row'] + 1, info['col'] + 1
+        if covered(row, col):
+            continue
+        cells = rows[row - 1]
+        cells.extend([None] * (col - len(cells)))
+        cells[col - 1] = _styled(ws, info['value'], style)
+
+    return rows
+
+
+def table_rows(ws, df, styles):
+    """Header and data rows of a DataFrame as styled write-only cells."""
+    header_styles = styles['header']
+    data_style = styles['data']
+
+    for r_idx, r in enumerate(dataframe_to_rows(df, index=False, header=True)):
+        if r_idx == 0:  # Header row
+            yield [
+                _styled(ws, value, header_styles[c_idx] if c_idx < len(header_styles) else styles['header_default'])
+                for c_idx, value in enumerate(r)
+            ]
+        else:
+            yield [_styled(ws, value, data_style) for value in r]
+
+
+def set_column_widths(ws, heading, widths=None):
+    """Column widths: the heading's own widths, optionally widened per column (1-based)."""
+    for col_idx, width in heading['col_widths'].items():
+        ws.column_dimensions[get_column_letter(col_idx + 1)].width = width
+    for col_idx, width in (widths or {}).items():
+        ws.column_dimensions[get_column_letter(col_idx)].width = width
+
+
+def write_merged_sheet(wb, title, df, heading, styles, widths=None):
+    """Write heading, blank row and table to a new sheet of a write-only workbook."""
+    ws = wb.create_sheet(title=title)
+
+    # Dimensions have to be in place before the first row is streamed
+    set_column_widths(ws, heading, widths)
+
+    for row in heading_rows(ws, heading, styles):
+        ws.append(row)
+
+    # Blank row after heading
+    ws.append([])
+
+    for row in table_rows(ws, df, styles):
+        ws.append(row)
+
+    return ws
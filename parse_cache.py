@@ -0,0 +1,184 @@
+import os
+import sys
+import stat
+import hashlib
+import pickle
+import tempfile
+
+from source_reader import read_source_file
+
+# On-disk cache of parsed source files, keyed by a hash of the file bytes.
+# Entries hold the read_source_file() result (cleaned DataFrame with GRAND
+# TOTAL and empty rows removed, plus heading/styles when parsed with layout),
+# pickled so dtypes and mixed object columns come back exactly as parsed.
+#
+# EXCEL_MERGER_CACHE     - cache folder (default: <root>/.parse_cache)
+# EXCEL_MERGER_CACHE_MB  - size limit before least-recently-used entries go (default: 512)
+#
+# Entries are unpickled, so a cache folder is only used when it is private
+# to the current user: created with mode 0o700, owned by the user and not
+# writable by anyone else (checked once per folder and process). Any other
+# folder is ignored and files are parsed without the cache.
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_MB = 512
+
+
+def default_cache_dir(root_dir):
+    """Cache folder for a root directory (EXCEL_MERGER_CACHE wins if set)."""
+    return os.environ.get("EXCEL_MERGER_CACHE") or os.path.join(root_dir, ".parse_cache")
+
+
+def user_cache_dir():
+    """Per-user cache folder for the app (%LOCALAPPDATA% on Windows, else $XDG_CACHE_HOME or ~/.cache)."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "excel_merger", "parse_cache")
+
+
+# Cache folder -> whether it is private to this user (see the module comment)
+_PRIVATE_DIRS = {}
+
+
+def cache_dir_is_private(cache_dir):
+    """Create cache_dir (mode 0o700) if needed and check nobody else can plant entries in it."""
+    if cache_dir in _PRIVATE_DIRS:
+        return _PRIVATE_DIRS[cache_dir]
+
+    private = False
+    try:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        info = os.lstat(cache_dir)
+        if not stat.S_ISDIR(info.st_mode):
+            private = False
+        elif hasattr(os, "getuid"):
+            private = info.st_uid == os.getuid() and not info.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+        else:
+            # Windows: folders under the user profile are per-user by default
+            private = True
+    except OSError:
+        private = False
+
+    if not private:
+        print(f"[WARN] Parse cache disabled: {cache_dir} is not a private folder of the current user")
+    _PRIVATE_DIRS[cache_dir] = private
+    return private
+
+
+def cache_max_bytes():
+    """Size limit of the cache in bytes."""
+    return int(float(os.environ.get("EXCEL_MERGER_CACHE_MB", DEFAULT_CACHE_MB)) * 1024 * 1024)
+
+
+def content_key(content):
+    """Hash of the raw file bytes (plus cache format version)."""
+    digest = hashlib.sha256(content)
+    digest.update(f"v{CACHE_VERSION}".encode())
+    return digest.hexdigest()
+
+
+def _entry_path(cache_dir, key):
+    return os.path.join(cache_dir, key[:2], f"{key}.pkl")
+
+
+def cache_get(cache_dir, key, with_layout=False):
+    """Return a cached parse result, or None on a miss."""
+    path = _entry_path(cache_dir, key)
+    try:
+        with open(path, "rb") as f:
+            source = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+    if with_layout and source.get('heading') is None:
+        return None
+
+    # Touch so pruning evicts least recently used entries first
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return source
+
+
+def cache_put(cache_dir, key, source):
+    """Store a parse result (written to a temp file, then moved into place)."""
+    path = _entry_path(cache_dir, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(source, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+def prune_cache(cache_dir, max_bytes=None):
+    """Evict least recently used entries until the cache fits in max_bytes."""
+    if max_bytes is None:
+        max_bytes = cache_max_bytes()
+    if not os.path.isdir(cache_dir) or not cache_dir_is_private(cache_dir):
+        return 0
+
+    entries = []
+    total = 0
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            if not name.endswith(".pkl"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            entries.append((info.st_mtime, info.st_size, path))
+            total += info.st_size
+
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            removed += 1
+        except OSError:
+            pass
+
+    return removed
+
+
+def read_source_file_cached(source, with_layout=False, cache_dir=None, label=None):
+    """
+    read_source_file() backed by the parse cache.
+
+    source may be a path or raw bytes. Only files whose bytes are new or
+    changed get parsed; with cache_dir=None (or a folder that is not
+    private to this user) this is a plain parse.
+    """
+    if cache_dir is None or not cache_dir_is_private(cache_dir):
+        return read_source_file(source, with_layout=with_layout, label=label)
+
+    if isinstance(source, (bytes, bytearray)):
+        content = bytes(source)
+    else:
+        if label is None:
+            label = source
+        with open(source, "rb") as f:
+            content = f.read()
+
+    key = content_key(content)
+    cached = cache_get(cache_dir, key, with_layout)
+    if cached is not None:
+        return cached
+
+    result = read_source_file(content, with_layout=with_layout, label=label)
+    cache_put(cache_dir, key, result)
+    return result
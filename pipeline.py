@@ -0,0 +1,247 @@
+import os
+import time
+import argparse
+import traceback
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from contextlib import redirect_stdout
+
+import pandas as pd
+
+from instrumentation import finish_run, run_record, stage
+from merge_alternate import list_month_files, merge
+from merged_store import load_merged_data, merged_store_path
+from report import generate_reports, prepare_report_data
+from report_writer import report_template
+from rollup import rollup
+from schema import apply_schema
+from summary import summarize
+
+# In-process runner for the merge -> reports / summary chain of one school.
+# The stages are plain function calls: the merge hands its combined frame
+# to the next stage in memory (no re-read of the merged workbook), names are
+# resolved and the employee tables and totals computed once, and the reports
+# and the summary are written concurrently from the same totals.
+#
+# Batch mode (--all) runs every school folder under the root on one pool of
+# worker processes. Each worker compiles the report template and styles
+# once and keeps its SR.NO layout memo across the schools it handles; the
+# status of every school goes into one run report, and the district
+# rollup (rollup.py) is brought up to date at the end.
+
+# ===== CONFIGURATION =====
+# Usage: python pipeline.py [folder_name | --all] [--workers N] [--append] [--full]
+# Example: python pipeline.py palasgaon
+# Example: python pipeline.py "KANYA BASMATH" --workers 4 --append
+# Example: python pipeline.py --all --workers 8   (every school, 8 schools at a time, then the district rollup)
+# Example: python pipeline.py palasgaon --run-record run.json   (stage timings as JSON)
+
+ROOT_DIR = os.environ.get("EXCEL_MERGER_ROOT", r"D:\excel merger")
+RUN_REPORT_FILE = "Batch_Run_Report.csv"
+RUN_REPORT_COLUMNS = ["School", "Status", "Months", "Rows", "Seconds", "Stages", "Error", "Log"]
+
+
+def parse_args(argv=None):
+    """Parse the school folder name and pipeline options."""
+    parser = argparse.ArgumentParser(description="Merge a school's monthly files, then write its reports and summary.")
+    parser.add_argument("folder", nargs="?", default="palasgaon",
+                        help="School folder under EXCEL_MERGER_ROOT")
+    parser.add_argument("--all", action="store_true",
+                        help="Process every school folder under EXCEL_MERGER_ROOT")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes for parsing and report rendering; "
+                             "with --all, schools processed at a time (default: 1)")
+    parser.add_argument("--append", action="store_true",
+                        help="Rebuild only months whose files changed")
+    parser.add_argument("--full", action="store_true",
+                        help="Regenerate every report instead of only employees whose data changed")
+    parser.add_argument("--run-record", metavar="FILE",
+                        help="Also write the stage timings of the run to FILE as JSON")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Track Python allocations per stage (tracemalloc; slower)")
+    return parser.parse_args(argv)
+
+
+# ===== STAGE RUNNER =====
+
+def run_stages(stages, max_workers=2):
+    """
+    Run a DAG of stages in a thread pool. stages maps a stage name to
+    (function, [dependency names]); a stage starts as soon as its
+    dependencies have finished and receives their results as keyword
+    arguments named after them, in a copy of the caller's context (so the
+    stages report into the caller's run record). Returns {stage name: result}.
+
+    The first failing stage's exception is raised once the stages already
+    running have finished; stages depending on it never start.
+    """
+    results = {}
+    pending = dict(stages)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            for name, (func, deps) in list(pending.items()):
+                if all(dep in results for dep in deps):
+                    context = contextvars.copy_context()
+                    running[pool.submit(context.run, func, **{dep: results[dep] for dep in deps})] = name
+                    del pending[name]
+
+            if not running:
+                raise ValueError(f"Stages with unknown or circular dependencies: {', '.join(pending)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name] = future.result()
+
+    return results
+
+
+# ===== SCHOOL PIPELINE =====
+
+def merged_data(merged, school_folder, root_dir=ROOT_DIR):
+    """
+    The (df, coerced) pair of load_merged_data() for a merge() result:
+    typed from the frame the merge kept in memory, or read back from disk
+    when the merged workbook was already up to date.
+    """
+    if merged['data'] is not None:
+        with stage("schema", rows=len(merged['data'])):
+            return apply_schema(merged['data'])
+    with stage("merged_load") as items:
+        data = load_merged_data(merged['output_file'], merged_store_path(root_dir, school_folder))
+        items['rows'] = len(data[0])
+    return data
+
+
+def run_school_pipeline(school_folder, root_dir=ROOT_DIR, workers=1, append=False, full=False, cache_dir=None):
+    """
+    Merge root_dir/school_folder, resolve its employees and compute their
+    tables and totals once, then write the employee reports and the
+    summary workbook concurrently from them.
+    Returns {stage name: result} for the merge, data, tables, reports and summary stages.
+    """
+    stages = {
+        'merge': (lambda: merge(school_folder, root_dir, workers=workers, append=append, cache_dir=cache_dir), []),
+        'data': (lambda merge: merged_data(merge, school_folder, root_dir), ['merge']),
+        'tables': (lambda data: prepare_report_data(data), ['data']),
+        'reports': (lambda tables: generate_reports(school_folder, root_dir, workers=workers, full=full,
+                                                    prepared=tables), ['tables']),
+        'summary': (lambda tables: summarize(school_folder, root_dir, totals=tables['totals']), ['tables']),
+    }
+    return run_stages(stages)
+
+
+# ===== BATCH MODE =====
+
+def find_school_folders(root_dir=ROOT_DIR):
+    """School folders under root_dir (sorted): folders holding month folders with .xls files."""
+    schools = []
+    for name in sorted(os.listdir(root_dir)):
+        path = os.path.join(root_dir, name)
+        if name.startswith(".") or not os.path.isdir(path):
+            continue
+        if list_month_files(path):
+            schools.append(name)
+    return schools
+
+
+def run_school_logged(school_folder, root_dir=ROOT_DIR, append=False, full=False):
+    """
+    run_school_pipeline() for batch mode: the school's console output goes
+    to {school_folder}_pipeline.log under root_dir (ending with its stage
+    table) and a failure is recorded instead of raised. Returns the
+    school's run report row, with the wall time of every stage.
+    """
+    log_file = os.path.join(root_dir, f"{school_folder}_pipeline.log")
+    status = {'School': school_folder, 'Status': "OK", 'Months': 0, 'Rows': 0, 'Error': "", 'Log': log_file}
+    start = time.perf_counter()
+
+    with open(log_file, "w", encoding="utf-8") as log, redirect_stdout(log):
+        with run_record(school_folder) as run:
+            try:
+                results = run_school_pipeline(school_folder, root_dir, append=append, full=full)
+                df = results['data'][0]
+                status['Months'] = df["Month"].nunique()
+                status['Rows'] = len(df)
+            except Exception as e:
+                traceback.print_exc(file=log)
+                status['Status'] = "FAILED"
+                status['Error'] = f"{type(e).__name__}: {e}"
+        finish_run(run)
+
+    status['Stages'] = "; ".join(f"{record['stage']} {record['wall_s']}s" for record in run['stages'])
+
+    status['Seconds'] = round(time.perf_counter() - start, 2)
+    return status
+
+
+def write_run_report(statuses, path):
+    """Write the per-school status rows of a batch run as CSV."""
+    pd.DataFrame(statuses, columns=RUN_REPORT_COLUMNS).to_csv(path, index=False)
+
+
+def run_batch(root_dir=ROOT_DIR, workers=1, append=False, full=False, schools=None):
+    """
+    Run the pipeline of every school folder under root_dir (or of the given
+    schools), `workers` schools at a time, and write their statuses to
+    RUN_REPORT_FILE under root_dir. A failing school does not stop the
+    others. Returns the status rows in school order.
+    """
+    if schools is None:
+        schools = find_school_folders(root_dir)
+    if not schools:
+        raise ValueError(f"No school folders with month .xls files found in {root_dir}")
+
+    print(f"Root: {root_dir}")
+    print(f"Schools: {len(schools)}")
+    if workers > 1:
+        print(f"Workers: {workers}")
+
+    def report_progress(status, done):
+        print(f"  [{done}/{len(schools)}] {status['School']} - {status['Status']} ({status['Seconds']}s)")
+
+    statuses = []
+    if workers > 1 and len(schools) > 1:
+        # One school per task: schools are large, uneven units of work
+        with ProcessPoolExecutor(max_workers=min(workers, len(schools)), initializer=report_template) as pool:
+            futures = [pool.submit(run_school_logged, school, root_dir, append, full) for school in schools]
+            for future in as_completed(futures):
+                statuses.append(future.result())
+                report_progress(statuses[-1], len(statuses))
+    else:
+        for school in schools:
+            statuses.append(run_school_logged(school, root_dir, append, full))
+            report_progress(statuses[-1], len(statuses))
+
+    order = {school: i for i, school in enumerate(schools)}
+    statuses.sort(key=lambda status: order[status['School']])
+
+    report_file = os.path.join(root_dir, RUN_REPORT_FILE)
+    write_run_report(statuses, report_file)
+
+    failed = [status['School'] for status in statuses if status['Status'] != "OK"]
+    print(f"\n[SUCCESS] {len(schools) - len(failed)} of {len(schools)} schools processed, run report: {report_file}")
+    if failed:
+        print(f"[ERROR] Failed: {', '.join(failed)} (see their _pipeline.log)")
+    return statuses
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    label = "batch" if args.all else f"pipeline {args.folder}"
+    with run_record(label, trace_memory=args.trace_memory) as run:
+        if args.all:
+            with stage("batch") as items:
+                statuses = run_batch(workers=args.workers, append=args.append, full=args.full)
+                items['schools'] = len(statuses)
+            with stage("rollup"):
+                rollup(full=args.full)
+        else:
+            run_school_pipeline(args.folder, workers=args.workers, append=args.append, full=args.full)
+    finish_run(run, args.run_record)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,467 +1,53 @@
-import pandas as pd
 import os
-import sys
-import xlrd
-import time
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
-from openpyxl.worksheet.page import PageMargins
-
-# PDF generation using Excel automation (Windows-only)
-try:
-    import win32com.client
-    from PyPDF2 import PdfMerger
-    HAS_WIN32 = True
-except ImportError:
-    HAS_WIN32 = False
+import argparse
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from identity import resolve_employee_names
+from instrumentation import file_bytes, finish_run, run_record, stage
+from merged_store import load_manifest, load_merged_data, merged_store_path, save_manifest
+from report_engine import build_employee_tables, clean_employee_names, employee_totals, february_rows
+from report_writer import (
+    employee_fingerprint, report_layout_key, report_template, safe_filename,
+    save_employee_report, write_report_batch,
+)
+from schema import EXCLUDE_COLUMNS, NUMERIC_COLUMNS, write_coercion_report
+from summary import summary_path, summary_rows_from_totals, write_summary_workbook
+
+# PDF generation using Excel automation (Windows-only); the modules are only
+# imported when the consolidated PDF is actually built
+HAS_WIN32 = all(importlib.util.find_spec(name) is not None for name in ("win32com", "PyPDF2"))
 
 # ===== CONFIGURATION =====
-# Usage: python report.py [folder_name]
+# Usage: python report.py [folder_name] [--workers N] [--full] [--with-summary]
 # Example: python report.py palasgaon
-# Example: python report.py "KANYA BASMATH"
+# Example: python report.py "KANYA BASMATH" --workers 4
+# Example: python report.py palasgaon --full   (rewrite every report, ignoring the manifest)
+# Example: python report.py palasgaon --with-summary   (also write the summary, same load and totals)
+# Example: python report.py palasgaon --run-record report_run.json   (stage timings as JSON)
 
 ROOT_DIR = os.environ.get("EXCEL_MERGER_ROOT", r"D:\excel merger")
-
-# Get folder name from command line or use default
-if len(sys.argv) > 1:
-    SCHOOL_FOLDER = sys.argv[1]
-else:
-    SCHOOL_FOLDER = "palasgaon"  # Default
-
-# Paths based on school
-MERGED_FILE = os.path.join(ROOT_DIR, f"{SCHOOL_FOLDER}_Merged_Monthly.xlsx")
-OUTPUT_DIR = os.path.join(ROOT_DIR, f"{SCHOOL_FOLDER}_income_tax_reports")
+EMP_NAME_COL = "EMPLOYEE NAME"
 TEMPLATE_FILE = os.path.join(ROOT_DIR, "DESHMUKH SURYAKANT NARAYANRAO.xls")
 
-print(f"School: {SCHOOL_FOLDER}")
-print(f"Merged File: {MERGED_FILE}")
-print(f"Output Dir: {OUTPUT_DIR}")
-
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-# Month order for sorting - handles both naming styles (apr25, APR 25)
-MONTH_ORDER = [
-    "mar 25", "mar25", "MAR 25",
-    "apr 25", "apr25", "APR 25",
-    "may 25", "may25", "MAY 25",
-    "jun 25", "jun25", "JUN 25",
-    "jul 25", "jul25", "JUL 25",
-    "aug 25", "aug25", "AUG 25",
-    "sep 25", "sep25", "SEP 25",
-    "oct 25", "oct25", "OCT 25",
-    "nov 25", "nov25", "NOV 25",
-    "dec 25", "dec25", "DEC 25",
-    "jan 26", "jan26", "JAN 26",
-    "feb 26", "feb26", "FEB 26"
-]
-
-# Map folder names to display names (handles variations)
-MONTH_DISPLAY = {
-    "mar 25": "Mar-2025", "mar25": "Mar-2025", "MAR 25": "Mar-2025",
-    "apr 25": "Apr-2025", "apr25": "Apr-2025", "APR 25": "Apr-2025",
-    "may 25": "May-2025", "may25": "May-2025", "MAY 25": "May-2025",
-    "jun 25": "Jun-2025", "jun25": "Jun-2025", "JUN 25": "Jun-2025",
-    "jul 25": "Jul-2025", "jul25": "Jul-2025", "JUL 25": "Jul-2025",
-    "aug 25": "Aug-2025", "aug25": "Aug-2025", "AUG 25": "Aug-2025",
-    "sep 25": "Sep-2025", "sep25": "Sep-2025", "SEP 25": "Sep-2025",
-    "oct 25": "Oct-2025", "oct25": "Oct-2025", "OCT 25": "Oct-2025",
-    "nov 25": "Nov-2025", "nov25": "Nov-2025", "NOV 25": "Nov-2025",
-    "dec 25": "Dec-2025", "dec25": "Dec-2025", "DEC 25": "Dec-2025",
-    "jan 26": "Jan-2026", "jan26": "Jan-2026", "JAN 26": "Jan-2026",
-    "feb 26": "Feb-2026", "feb26": "Feb-2026", "FEB 26": "Feb-2026"
-}
-
-# Columns to exclude from report (metadata columns, not data)
-EXCLUDE_COLUMNS = [
-    "Unnamed: 0", "SR.NO", "Source_File", "Month", "Month_Order",
-    "EMPLOYEE NAME", "GENDER M/F", "NAME OF SCHOOL",
-    # User requested to remove these columns from all reports:
-    "GROSS AFTER DEDUCTING FA", "GROSS PAYMENT AFTER GOVT DEDUCTIONS",
-    "GROSS PAYMENT AFTER NPS DEDUCTIONS", "NGR(TOTAL DEDUCTIONS)",
-    "EMPLOYEE NET SALARY", "TOTAL GOVT DEDUCTIONS", "NPS TOTAL"
-]
-
-# Columns that are identifiers (show once, not per month)
-INFO_COLUMNS = [
-    "BLOCK / TALUKA", "SCHOOL UDISE CODE", "SCHOOL SHALARTH DDO CODE",
-    "S.R NO OF EMPL", "SHALARTH ID", "DESIGNATION ", "GPF NO", "DCPS NO",
-    "PRAN NO", "PAN NO", "ADHAR NO", "MOB NO", "EMAIL ID",
-    "DDO BANK NAME", "DDO BANK ACCOUNT NUMBER", "DDO BANK IFSC CODE",
-    "BANK NAME", "BANK ACCOUNT NUMBER", "BANK IFSC CODE", "BRANCH NAME",
-    "PAY MATRIX", "REMARKS"
-]
-
-# Numeric columns (these will be shown per month and summed)
-NUMERIC_COLUMNS = [
-    "BASIC PAY", "D.A", "HRA", "T.A", "T.A ARREARS", "TRIBAL ALLOWANCE",
-    "WASHING ALLOWANCE ", "DA ARREARS ", "HRA ARREARS ", "BASIC ARREARS ",
-    "CLA", "NPS EMPR ALLOW", "TOTAL PAY", "F A",
-    "GPF", "GPF ADV", "PT", "GIS(ZP)", "GIS SCOUT", "DCPS REGULAR",
-    "DCPS DELAYED", "DCPS PAY ARREARS RECOVERY", "REVENUE STAMP",
-    "DCPS DA ARREARS RECOVERY", "GROUP ACCIDENTAL POLICY", "NAA",
-    "TOTAL GOVT DEDUCTIONS",
-    "NPS EMPR CONTRI", "NPS EMP CONTRI", "NPS EMPR CONTRI ARR",
-    "NPS EMP CONTRI ARR", "NPS TOTAL",
-    "INCOME TAX", "CO-OP BANK", "NGR(LIC)", "NGR(SOCIETY LOAN)", "NGR(MISC)",
-    "NGR(OTHER RECOVERY)", "NGR(RD)", "NGR(OTHER DEDUCTION)"
-]
-
-
-def find_header_row_xlsx(file_path, sheet_name=0):
-    """Find the row containing SR.NO header in the merged xlsx file."""
-    preview = pd.read_excel(file_path, sheet_name=sheet_name, header=None, nrows=20)
-    for i, row in preview.iterrows():
-        if row.astype(str).str.upper().str.strip().isin(["SR.NO"]).any():
-            return i
-    return 0
-
-
-def load_merged_data():
-    """Load data from the merged Excel file (all sheets)."""
-    print(f"Reading {MERGED_FILE}...")
-    
-    xlsx = pd.ExcelFile(MERGED_FILE)
-    sheet_names = xlsx.sheet_names
-    print(f"Found {len(sheet_names)} sheets: {sheet_names}")
-    
-    all_data = []
-    
-    for sheet_name in sheet_names:
-        header_row = find_header_row_xlsx(MERGED_FILE, sheet_name)
-        df = pd.read_excel(MERGED_FILE, sheet_name=sheet_name, header=header_row)
-        df = df.dropna(how="all")
-        
-        if "Month" not in df.columns:
-            df["Month"] = sheet_name
-        
-        all_data.append(df)
-        print(f"  [{sheet_name}] - {len(df)} rows")
-    
-    combined_df = pd.concat(all_data, ignore_index=True)
-    print(f"\nTotal records: {len(combined_df)}")
-    
-    return combined_df
-
 
-def get_value(row_data, col_name):
-    """Safely get value from row."""
-    if col_name is None:
-        return ""
-    try:
-        val = row_data.get(col_name, "")
-        if pd.isna(val):
-            return ""
-        return val
-    except:
-        return ""
-
-
-def is_zero_or_empty(val):
-    """Check if value is 0, empty, or NaN."""
-    if pd.isna(val):
-        return True
-    if val == "" or val == 0 or val == 0.0:
-        return True
-    try:
-        if float(val) == 0:
-            return True
-    except:
-        pass
-    return False
-
-
-def get_non_zero_columns(emp_df, numeric_cols):
-    """Get list of numeric columns that have at least one non-zero value for this employee."""
-    non_zero_cols = []
-    for col in numeric_cols:
-        if col in emp_df.columns:
-            # Check if any value in this column is non-zero
-            has_non_zero = False
-            for val in emp_df[col]:
-                if not is_zero_or_empty(val):
-                    has_non_zero = True
-                    break
-            if has_non_zero:
-                non_zero_cols.append(col)
-    return non_zero_cols
-
-
-def create_february_row(jan_row, active_columns):
-    """Create February row based on January data with modifications."""
-    feb_row = jan_row.copy()
-    feb_row["Month"] = "feb26"
-    
-    # PT: 300 if other months have 200, else keep 0
-    pt_val = get_value(jan_row, "PT")
-    if pt_val == 200:
-        feb_row["PT"] = 300
-    elif pt_val == 0 or pt_val == "" or pd.isna(pt_val):
-        feb_row["PT"] = 0
-    else:
-        feb_row["PT"] = 300  # Default to 300 if PT exists
-    
-    # ACC. INS. = 531 for Feb
-    feb_row["GROUP ACCIDENTAL POLICY"] = 531
-
-    # Income Tax should be 0 for February everywhere
-    if "INCOME TAX" in feb_row.index:
-        feb_row["INCOME TAX"] = 0
-    
-    return feb_row
-
-
-def create_employee_report(emp_name, emp_df, all_numeric_cols):
-    """Create individual employee report with all non-zero columns."""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Income Tax Details"
-    
-    # Month variants used throughout the report
-    jan_variants = ["jan26", "jan 26", "JAN 26"]
-    feb_variants = ["feb26", "feb 26", "FEB 26"]
-
-    # Sort by month
-    emp_df = emp_df.copy()
-    emp_df["Month_Order"] = emp_df["Month"].apply(
-        lambda x: MONTH_ORDER.index(x) if x in MONTH_ORDER else 99
-    )
-    emp_df = emp_df.sort_values("Month_Order")
-
-    # Income Tax must be 0 for February in all cases (even if source has values)
-    if "INCOME TAX" in emp_df.columns and "Month" in emp_df.columns:
-        emp_df.loc[emp_df["Month"].isin(feb_variants), "INCOME TAX"] = 0
-    
-    first_row = emp_df.iloc[0]
-    
-    # Check if January exists and February doesn't (handle different naming)
-    has_jan = any(v in emp_df["Month"].values for v in jan_variants)
-    has_feb = any(v in emp_df["Month"].values for v in feb_variants)
-    
-    # Find which January variant exists
-    jan_month = None
-    for v in jan_variants:
-        if v in emp_df["Month"].values:
-            jan_month = v
-            break
-    
-    # Get columns that have non-zero values for this employee
-    active_numeric_cols = get_non_zero_columns(emp_df, all_numeric_cols)
-
-    # Always keep INCOME TAX column even if all values are zero
-    if "INCOME TAX" in all_numeric_cols and "INCOME TAX" in emp_df.columns:
-        if "INCOME TAX" not in active_numeric_cols:
-            active_numeric_cols.append("INCOME TAX")
-
-    # Always show Income Tax even if all values are zero
-    if "INCOME TAX" in all_numeric_cols and "INCOME TAX" not in active_numeric_cols:
-        active_numeric_cols.append("INCOME TAX")
-    
-    # If adding February, check if PT and GROUP ACCIDENTAL POLICY should be included
-    if has_jan and not has_feb and jan_month:
-        jan_data = emp_df[emp_df["Month"] == jan_month].iloc[0]
-        pt_val = get_value(jan_data, "PT")
-        if pt_val == 200 or (pt_val and pt_val != 0):
-            if "PT" not in active_numeric_cols:
-                active_numeric_cols.append("PT")
-        if "GROUP ACCIDENTAL POLICY" not in active_numeric_cols:
-            active_numeric_cols.append("GROUP ACCIDENTAL POLICY")
-    
-    # Preserve original order of columns
-    active_numeric_cols = [col for col in all_numeric_cols if col in active_numeric_cols]
-    
-    # ===== STYLES =====
-    title_font = Font(bold=True, size=14)
-    header_font = Font(bold=True, size=9)
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    center_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    
-    # ===== ROW 1: TITLE =====
-    ws.cell(row=1, column=1, value="INCOME TAX DETAILS 2025-26")
-    ws.cell(row=1, column=1).font = title_font
-    ws.cell(row=1, column=1).alignment = center_align
-    total_cols = 2 + len(active_numeric_cols)  # SR.NO + MONTH + numeric columns
-    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=total_cols)
-    
-    # ===== ROW 2: EMPLOYEE NAME + SCHOOL =====
-    gender = str(first_row.get("GENDER M/F", "")).strip().upper()
-    salutation = "SHRI" if gender == "M" else "SHRIMATI"
-    
-    ws.cell(row=2, column=1, value=f"{salutation} {emp_name}")
-    ws.cell(row=2, column=1).font = Font(bold=True)
-    
-    school_name = get_value(first_row, "NAME OF SCHOOL")
-    school_col = min(10, total_cols)
-    ws.cell(row=2, column=school_col, value=school_name)
-    ws.cell(row=2, column=school_col).font = Font(bold=True)
-    
-    # ===== ROW 3: COLUMN HEADERS =====
-    headers = ["SR. NO.", "MONTH"] + active_numeric_cols
-    for col_idx, header in enumerate(headers, start=1):
-        cell = ws.cell(row=3, column=col_idx, value=header)
-        cell.font = header_font
-        cell.border = thin_border
-        cell.alignment = center_align
-    
-    # ===== DATA ROWS =====
-    current_row = 4
-    sr_no = 1
-    
-    for _, row_data in emp_df.iterrows():
-        month_display = MONTH_DISPLAY.get(row_data["Month"], row_data["Month"])
-        
-        data = [sr_no, month_display]
-        for col in active_numeric_cols:
-            if col == "INCOME TAX" and row_data.get("Month") in feb_variants:
-                data.append(0)
-            else:
-                data.append(get_value(row_data, col))
-        
-        for col_idx, value in enumerate(data, start=1):
-            cell = ws.cell(row=current_row, column=col_idx, value=value)
-            cell.border = thin_border
-            if col_idx > 1:
-                cell.alignment = Alignment(horizontal='right')
-        
-        sr_no += 1
-        current_row += 1
-    
-    # ===== ADD FEBRUARY ROW (if January exists but February doesn't) =====
-    if has_jan and not has_feb and jan_month:
-        jan_data = emp_df[emp_df["Month"] == jan_month].iloc[0]
-        feb_data = create_february_row(jan_data, active_numeric_cols)
-        
-        data = [sr_no, "Feb-2026"]
-        for col in active_numeric_cols:
-            if col == "PT":
-                data.append(feb_data["PT"])
-            elif col == "GROUP ACCIDENTAL POLICY":
-                data.append(531)
-            elif col == "INCOME TAX":
-                data.append(0)
-            else:
-                data.append(get_value(feb_data, col))
-        
-        for col_idx, value in enumerate(data, start=1):
-            cell = ws.cell(row=current_row, column=col_idx, value=value)
-            cell.border = thin_border
-            if col_idx > 1:
-                cell.alignment = Alignment(horizontal='right')
-        
-        sr_no += 1
-        current_row += 1
-    
-    # ===== TOTAL ROW =====
-    def safe_sum(col_name):
-        try:
-            ser = emp_df[col_name].fillna(0)
-            if col_name == "INCOME TAX" and "Month" in emp_df.columns:
-                ser = ser.where(~emp_df["Month"].isin(feb_variants), 0)
-            total = ser.sum()
-            # Add February values if applicable
-            if has_jan and not has_feb and jan_month:
-                jan_data = emp_df[emp_df["Month"] == jan_month].iloc[0]
-                feb_data = create_february_row(jan_data, active_numeric_cols)
-                if col_name == "PT":
-                    total += feb_data["PT"]
-                elif col_name == "GROUP ACCIDENTAL POLICY":
-                    total += 531
-                elif col_name == "INCOME TAX":
-                    total += 0
-                else:
-                    feb_val = get_value(feb_data, col_name)
-                    if feb_val and feb_val != "":
-                        try:
-                            total += float(feb_val)
-                        except:
-                            pass
-            return total
-        except:
-            return 0
-    
-    totals = ["", "Total"]
-    for col in active_numeric_cols:
-        totals.append(safe_sum(col))
-    
-    for col_idx, value in enumerate(totals, start=1):
-        cell = ws.cell(row=current_row, column=col_idx, value=value)
-        cell.border = thin_border
-        cell.font = Font(bold=True)
-        if col_idx > 1:
-            cell.alignment = Alignment(horizontal='right')
-    
-    current_row += 2
-    
-    # ===== FOOTER =====
-    ws.cell(row=current_row, column=1, 
-            value="या तक्त्यात काही चूक आढळून आल्यास तात्काळ मुख्याध्यापकांच्या लक्षात आणून द्यावी, नजरचुकीने काही चूक झाल्यास लागणा-या आयकरास कर्मचारी स्वत: जबाबदार राहील.")
-    current_row += 2
-    
-    ws.cell(row=current_row, column=1, value="Employee Signature")
-    ws.cell(row=current_row, column=1).font = Font(bold=True)
-    headmaster_col = max(14, total_cols - 3)
-    ws.cell(row=current_row, column=headmaster_col, value="Headmaster")
-    ws.cell(row=current_row, column=headmaster_col).font = Font(bold=True)
-    current_row += 1
-    
-    ws.cell(row=current_row, column=1, value=f"{salutation} {emp_name}")
-    ws.cell(row=current_row, column=1).font = Font(bold=True)
-    
-    # ===== COLUMN WIDTHS - Dynamic to fill A4 Landscape =====
-    # A4 landscape usable width with margins: ~140 Excel character units
-    # We distribute this across all columns
-    
-    TOTAL_PAGE_WIDTH = 140  # Excel units for A4 landscape with margins
-    SR_NO_WIDTH = 6
-    MONTH_WIDTH = 11
-    
-    ws.column_dimensions['A'].width = SR_NO_WIDTH
-    ws.column_dimensions['B'].width = MONTH_WIDTH
-    
-    # Distribute remaining width evenly among data columns
-    remaining_cols = total_cols - 2
-    if remaining_cols > 0:
-        remaining_width = TOTAL_PAGE_WIDTH - SR_NO_WIDTH - MONTH_WIDTH
-        col_width = remaining_width / remaining_cols
-        # Ensure minimum readable width of 8 and max of 15
-        col_width = max(8, min(15, col_width))
-        for i in range(3, total_cols + 1):
-            ws.column_dimensions[get_column_letter(i)].width = col_width
-    
-    # ===== PAGE SETUP FOR A4 LANDSCAPE PRINTING =====
-    ws.page_setup.orientation = 'landscape'
-    ws.page_setup.paperSize = ws.PAPERSIZE_A4
-    
-    # Fit all content to 1 page
-    ws.page_setup.fitToPage = True
-    ws.page_setup.fitToWidth = 1
-    ws.page_setup.fitToHeight = 1
-    
-    # Set comfortable margins (in inches)
-    ws.page_margins = PageMargins(
-        left=0.3, right=0.3,
-        top=0.4, bottom=0.4,
-        header=0.2, footer=0.2
-    )
-    
-    # Set print area to include ALL content
-    last_row = current_row
-    last_col = get_column_letter(total_cols)
-    ws.print_area = f'A1:{last_col}{last_row}'
-    
-    # Repeat header row on each page
-    ws.print_title_rows = '3:3'
-    
-    # Center horizontally, align to top (no vertical centering)
-    ws.print_options.horizontalCentered = True
-    ws.print_options.verticalCentered = False
-    
-    return wb
+def parse_args(argv=None):
+    """Parse the school folder name and report options."""
+    parser = argparse.ArgumentParser(description="Generate employee income tax reports.")
+    parser.add_argument("folder", nargs="?", default="palasgaon",
+                        help="School folder under EXCEL_MERGER_ROOT")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Render reports in N worker processes (default: 1)")
+    parser.add_argument("--full", action="store_true",
+                        help="Regenerate every report instead of only employees whose data changed")
+    parser.add_argument("--with-summary", action="store_true",
+                        help="Also write {folder}_Summary_Totals.xlsx from the same totals (replaces summary.py)")
+    parser.add_argument("--run-record", metavar="FILE",
+                        help="Also write the stage timings of the run to FILE as JSON")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Track Python allocations per stage (tracemalloc; slower)")
+    return parser.parse_args(argv)
 
 
 def create_consolidated_pdf_from_excel(output_dir, output_pdf_path):
@@ -469,6 +55,10 @@ def create_consolidated_pdf_from_excel(output_dir, output_pdf_path):
     Create consolidated PDF by exporting each Excel file to PDF using Excel,
     then merging all PDFs into one.
     """
+    import pythoncom
+    import win32com.client
+    from PyPDF2 import PdfMerger
+
     print("\nCreating consolidated PDF using Excel export...")
     
     # Create temp folder for individual PDFs
@@ -485,7 +75,9 @@ def create_consolidated_pdf_from_excel(output_dir, output_pdf_path):
     
     print(f"Found {len(xlsx_files)} Excel files to convert...")
     
-    # Initialize Excel application
+    # Initialize Excel application. COM is per thread, and this may run on a
+    # pipeline worker thread rather than the main one.
+    pythoncom.CoInitialize()
     excel = None
     try:
         excel = win32com.client.Dispatch("Excel.Application")
@@ -560,75 +152,230 @@ def create_consolidated_pdf_from_excel(output_dir, output_pdf_path):
                 excel.Quit()
             except:
                 pass
+            excel = None
+        pythoncom.CoUninitialize()
+
+
+def report_path(output_dir, emp_name):
+    return os.path.join(output_dir, f"{safe_filename(emp_name)}.xlsx")
+
+
+def plan_reports(tables, fingerprints, previous, output_dir):
+    """
+    Tables of the employees whose report has to be written: new employees,
+    changed fingerprints, or a report file that is missing.
+    fingerprints / previous map employee name -> fingerprint of this / the last run.
+    """
+    return [
+        table for table in tables
+        if previous.get(table['name']) != fingerprints[table['name']]
+        or not os.path.exists(report_path(output_dir, table['name']))
+    ]
+
+
+def remove_dropped_reports(previous, tables, output_dir):
+    """Delete reports of employees from the last run who are no longer in the data; returns how many."""
+    current = {safe_filename(table['name']) for table in tables}
+    removed = 0
+    for emp_name in previous:
+        if safe_filename(emp_name) in current:
+            continue
+        file_path = report_path(output_dir, emp_name)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+            removed += 1
+    return removed
+
+
+def write_reports(tables, output_dir, workers=1):
+    """
+    Render and save every employee's report; returns the names written.
+
+    With workers > 1 the tables are split into batches rendered in a process
+    pool (each worker compiles the report template once). An employee whose
+    report fails is printed and skipped, in either mode.
+    """
+    done = []
+
+    if workers <= 1 or len(tables) <= 1:
+        template = report_template()
+        for table in tables:
+            try:
+                save_employee_report(table, output_dir, template)
+                done.append(table['name'])
+
+                if len(done) % 10 == 0:
+                    print(f"  Generated {len(done)} reports...")
+
+            except Exception as e:
+                print(f"Error creating report for {table['name']}: {e}")
+        return done
+
+    chunksize = max(1, len(tables) // (workers * 4))
+    batches = [tables[i:i + chunksize] for i in range(0, len(tables), chunksize)]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=report_template) as pool:
+        for written, failures in pool.map(write_report_batch, batches, repeat(output_dir)):
+            for emp_name, error in failures:
+                print(f"Error creating report for {emp_name}: {error}")
+            done.extend(written)
+            print(f"  Generated {len(done)}/{len(tables)} reports...")
+
+    return done
 
 
 # =================== MAIN ===================
 
-print("Loading merged data...")
-df = load_merged_data()
+def prepare_report_data(data, emp_col=EMP_NAME_COL):
+    """
+    Everything the reports and the summary are written from, computed once
+    from the (df, coerced) pair of load_merged_data(): names cleaned and
+    resolved to one per person, then every employee's totals and report
+    table. Returns {'df', 'coerced', 'numeric_cols', 'totals', 'tables'}.
+    """
+    df, coerced = data
+    print(f"Total records loaded: {len(df)}")
+    print(f"Available columns: {len(df.columns)}")
 
-print(f"Total records loaded: {len(df)}")
-print(f"Available columns: {len(df.columns)}")
+    # Get actual numeric columns that exist in the data (excluding those we don't want)
+    numeric_cols = [col for col in NUMERIC_COLUMNS if col in df.columns and col not in EXCLUDE_COLUMNS]
+    print(f"Numeric columns found: {len(numeric_cols)}")
 
-# Get actual numeric columns that exist in the data (excluding those we don't want)
-actual_numeric_cols = [col for col in NUMERIC_COLUMNS if col in df.columns and col not in EXCLUDE_COLUMNS]
-print(f"Numeric columns found: {len(actual_numeric_cols)}")
+    with stage("report_tables", rows=len(df)) as items:
+        # Normalize employee names, dropping blank and GRAND TOTAL rows
+        df = clean_employee_names(df, emp_col)
 
-# Find the employee name column
-EMP_NAME_COL = "EMPLOYEE NAME"
-print(f"Using employee name column: {EMP_NAME_COL}")
+        # One name per person (by SHALARTH ID / PAN NO / DCPS NO, else matched names)
+        df, renamed = resolve_employee_names(df, emp_col)
+        if renamed:
+            print(f"Name spellings merged into one employee: {len(renamed)}")
 
-# Normalize employee names
-df[EMP_NAME_COL] = df[EMP_NAME_COL].astype(str).str.strip().str.upper()
+        print(f"Unique employees: {df[emp_col].nunique()}")
 
-# Remove invalid names
-df = df[df[EMP_NAME_COL] != ""]
-df = df[df[EMP_NAME_COL] != "NAN"]
-df = df[~df[EMP_NAME_COL].str.contains("GRAND TOTAL", case=False, na=False)]
+        # Compute every employee's rows, active columns and totals in one pass
+        feb = february_rows(df, emp_col)
+        totals = employee_totals(df, numeric_cols, emp_col, feb)
+        tables = build_employee_tables(df, numeric_cols, emp_col, feb, totals)
+        items['employees'] = len(tables)
 
-print(f"Unique employees: {df[EMP_NAME_COL].nunique()}")
+    return {'df': df, 'coerced': coerced, 'numeric_cols': numeric_cols, 'totals': totals, 'tables': tables}
 
-# Generate reports for each employee
-count = 0
-for emp_name, emp_df in df.groupby(EMP_NAME_COL):
-    if not emp_name or emp_name == "NAN":
-        continue
-    
-    try:
-        wb = create_employee_report(emp_name, emp_df, actual_numeric_cols)
-        
-        # Safe filename
-        safe_name = emp_name.replace("/", "_").replace("\\", "_").replace(":", "_")
-        safe_name = safe_name.replace("*", "_").replace("?", "_").replace('"', "_")
-        safe_name = safe_name.replace("<", "_").replace(">", "_").replace("|", "_")
-        
-        file_path = os.path.join(OUTPUT_DIR, f"{safe_name}.xlsx")
-        wb.save(file_path)
-        count += 1
-        
-        if count % 10 == 0:
-            print(f"  Generated {count} reports...")
-            
-    except Exception as e:
-        print(f"Error creating report for {emp_name}: {e}")
 
-print(f"\n[SUCCESS] Generated {count} employee reports in: {OUTPUT_DIR}")
+def generate_reports(school_folder, root_dir=ROOT_DIR, workers=1, full=False, with_summary=False, data=None,
+                     prepared=None):
+    """
+    Generate the income tax report of every employee in
+    {school_folder}_Merged_Monthly.xlsx under root_dir (plus the
+    consolidated PDF where Excel is available). Only employees whose report
+    content changed since the last run are rewritten unless full=True.
+
+    with_summary=True also writes {school_folder}_Summary_Totals.xlsx from
+    the same loaded data and employee totals the reports show, so the
+    merged data is read once for both. data may hold the (df, coerced)
+    pair of load_merged_data() when the caller already has it in memory,
+    prepared the prepare_report_data() result of it.
+    Returns the report folder.
+    """
+    # Paths based on school
+    merged_file = os.path.join(root_dir, f"{school_folder}_Merged_Monthly.xlsx")
+    store_file = merged_store_path(root_dir, school_folder)
+    output_dir = os.path.join(root_dir, f"{school_folder}_income_tax_reports")
+    coerced_file = os.path.join(root_dir, f"{school_folder}_Coerced_Cells.csv")
+    manifest_file = os.path.join(root_dir, f"{school_folder}_income_tax_reports.manifest.json")
+
+    print(f"School: {school_folder}")
+    print(f"Merged File: {merged_file}")
+    print(f"Output Dir: {output_dir}")
+    if workers > 1:
+        print(f"Workers: {workers}")
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    if prepared is None:
+        if data is None:
+            print("Loading merged data...")
+            with stage("merged_load") as items:
+                data = load_merged_data(merged_file, store_file)
+                items['rows'] = len(data[0])
+        prepared = prepare_report_data(data)
+    coerced = prepared['coerced']
+    actual_numeric_cols = prepared['numeric_cols']
+    totals = prepared['totals']
+    tables = prepared['tables']
+
+    if len(coerced):
+        print(f"Non-numeric cells treated as empty: {len(coerced)} (see {coerced_file})")
+    write_coercion_report(coerced, coerced_file)
+
+    if with_summary:
+        with stage("summary_write", employees=len(totals)) as items:
+            summary_file = summary_path(root_dir, school_folder)
+            summary_rows = summary_rows_from_totals(totals)
+            write_summary_workbook(summary_rows, actual_numeric_cols, school_folder, summary_file)
+            print(f"Summary file created: {summary_file} ({len(summary_rows)} employees)")
+            items['bytes'] = file_bytes(summary_file)
+
+    # Only employees whose report content changed since the last run are rewritten
+    layout = report_layout_key()
+    fingerprints = {table['name']: employee_fingerprint(table) for table in tables}
+    manifest = load_manifest(manifest_file) or {}
+    last_run = manifest.get("employees", {})
+    previous = last_run if not full and manifest.get("layout") == layout else {}
+
+    removed = remove_dropped_reports(last_run, tables, output_dir)
+    if removed:
+        print(f"Removed {removed} reports of employees no longer in the data")
+
+    stale = plan_reports(tables, fingerprints, previous, output_dir)
+    if previous:
+        print(f"Reports to regenerate: {len(stale)} of {len(tables)} employees")
+
+    # Generate reports for each employee
+    with stage("report_write", employees=len(stale)) as items:
+        written = write_reports(stale, output_dir, workers)
+        items['written'] = len(written)
+        items['bytes'] = file_bytes(*(report_path(output_dir, name) for name in written))
+
+    # Employees whose report failed are left out, so the next run retries them
+    failed = {table['name'] for table in stale} - set(written)
+    save_manifest(manifest_file, {
+        "layout": layout,
+        "employees": {name: fp for name, fp in fingerprints.items() if name not in failed},
+    })
+
+    print(f"\n[SUCCESS] Generated {len(written)} employee reports in: {output_dir}")
+
+    # ===== Generate Consolidated PDF =====
+    if HAS_WIN32:
+        print("\n" + "="*50)
+        print("Generating Consolidated PDF (Excel Print Preview Style)...")
+        print("="*50)
+
+        pdf_output_path = os.path.join(output_dir, f"{school_folder}_All_Reports_Consolidated.pdf")
 
-# ===== Generate Consolidated PDF =====
-if HAS_WIN32:
-    print("\n" + "="*50)
-    print("Generating Consolidated PDF (Excel Print Preview Style)...")
-    print("="*50)
+        try:
+            with stage("pdf") as items:
+                pdf_count = create_consolidated_pdf_from_excel(output_dir, pdf_output_path)
+                items['reports'] = pdf_count
+                items['bytes'] = file_bytes(pdf_output_path)
+            print(f"\n[SUCCESS] Consolidated PDF created: {pdf_output_path}")
+            print(f"          Contains {pdf_count} employee reports in landscape A4 format")
+        except Exception as e:
+            print(f"[ERROR] Failed to create consolidated PDF: {e}")
+            import traceback
+            traceback.print_exc()
+    else:
+        print("\n[SKIP] PDF generation skipped (pywin32 not available — requires Windows with Excel installed)")
 
-    pdf_output_path = os.path.join(OUTPUT_DIR, f"{SCHOOL_FOLDER}_All_Reports_Consolidated.pdf")
+    return output_dir
 
-    try:
-        pdf_count = create_consolidated_pdf_from_excel(OUTPUT_DIR, pdf_output_path)
-        print(f"\n[SUCCESS] Consolidated PDF created: {pdf_output_path}")
-        print(f"          Contains {pdf_count} employee reports in landscape A4 format")
-    except Exception as e:
-        print(f"[ERROR] Failed to create consolidated PDF: {e}")
-        import traceback
-        traceback.print_exc()
-else:
-    print("\n[SKIP] PDF generation skipped (pywin32 not available — requires Windows with Excel installed)")
+
+def main(argv=None):
+    args = parse_args(argv)
+    with run_record(f"report {args.folder}", trace_memory=args.trace_memory) as run:
+        generate_reports(args.folder, workers=args.workers, full=args.full, with_summary=args.with_summary)
+    finish_run(run, args.run_record)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import numpy as np
+import pandas as pd
+
+from schema import MONTH_DISPLAY, month_sort_key
+
+# Batch computation behind the employee income-tax reports and summary.
+# The combined frame is sorted once by employee and financial-year month;
+# every employee is then a contiguous block of rows, so active columns,
+# totals and the synthetic February rows come from whole-frame operations
+# instead of a pandas groupby per employee.
+
+JAN_VARIANTS = ["jan26", "jan 26", "JAN 26"]
+FEB_VARIANTS = ["feb26", "feb 26", "FEB 26"]
+FEB_MONTH = "feb26"
+FEB_DISPLAY = MONTH_DISPLAY[FEB_MONTH]
+
+PT_COL = "PT"
+GAP_COL = "GROUP ACCIDENTAL POLICY"
+INCOME_TAX_COL = "INCOME TAX"
+
+# Synthetic February: employees with January but no February get a copy of
+# their January row with these rules applied (column -> rule on the January
+# values of all such employees at once). Every other column keeps January's value.
+FEBRUARY_RULES = {
+    # PT: 300 if January had PT (200 -> 300), else 0
+    PT_COL: lambda jan: np.where(jan.fillna(0).ne(0), 300, 0),
+    # ACC. INS. = 531 for Feb
+    GAP_COL: lambda jan: 531,
+    # Income Tax should be 0 for February everywhere
+    INCOME_TAX_COL: lambda jan: 0,
+}
+
+# Synthetic rows sort after every real month of the employee
+SYNTHETIC_MONTH_KEY = 1000
+
+
+def clean_employee_names(df, emp_col="EMPLOYEE NAME"):
+    """Employee names stripped and upper-cased; rows without a name and GRAND TOTAL rows dropped."""
+    df = df.copy()
+    df[emp_col] = df[emp_col].astype(str).str.strip().str.upper()
+
+    # Remove invalid names
+    df = df[df[emp_col] != ""]
+    df = df[df[emp_col] != "NAN"]
+    return df[~df[emp_col].str.contains("GRAND TOTAL", case=False, na=False)]
+
+
+def employee_row_index(df, emp_col="EMPLOYEE NAME"):
+    """
+    Positional row indices of every employee (name -> array, rows in frame
+    order), built in one pass; df.iloc[index[name]] replaces a boolean mask
+    scan of the whole frame per employee.
+    """
+    return df.groupby(df[emp_col].to_numpy(), sort=False).indices
+
+
+def zero_february_income_tax(df):
+    """Income Tax must be 0 for February in all cases (even if source has values)."""
+    if INCOME_TAX_COL in df.columns:
+        df.loc[df["Month"].isin(FEB_VARIANTS).to_numpy(), INCOME_TAX_COL] = 0
+    return df
+
+
+def february_rows(df, emp_col="EMPLOYEE NAME"):
+    """
+    Synthetic February rows, one per employee (name order) who has a
+    January month and no February: the employee's first January row (of the
+    first spelling in JAN_VARIANTS) with FEBRUARY_RULES applied and Month
+    set to FEB_MONTH. Same columns as df, ready to concatenate.
+    """
+    months = df["Month"].astype(object)
+    names = df[emp_col].to_numpy()
+    has_feb = months.isin(FEB_VARIANTS).groupby(names).any()
+
+    jan = pd.DataFrame({
+        "emp": names,
+        "rank": months.map({v: i for i, v in enumerate(JAN_VARIANTS)}).to_numpy(),
+        "pos": np.arange(len(df)),
+    })
+    jan = jan[jan["rank"].notna()]
+    jan = jan[~jan["emp"].map(has_feb).to_numpy(dtype=bool)]
+    jan = jan.sort_values(["emp", "rank", "pos"]).drop_duplicates("emp")
+
+    feb = df.iloc[jan["pos"].to_numpy()].reset_index(drop=True)
+    for col, rule in FEBRUARY_RULES.items():
+        if col in feb.columns:
+            values = pd.Series(rule(feb[col]), index=feb.index)
+            feb[col] = values.astype(feb[col].dtype)
+    feb["Month"] = FEB_MONTH
+    return feb
+
+
+def employee_totals(df, numeric_cols, emp_col="EMPLOYEE NAME", feb=None):
+    """
+    Total of every numeric column per employee (indexed by name, sorted):
+    all months plus the synthetic February row, with February Income Tax
+    counted as zero. Whole-rupee columns total as int64, others as float64.
+    """
+    if feb is None:
+        feb = february_rows(df, emp_col)
+
+    keep = [emp_col, "Month"] + numeric_cols
+    data = pd.concat([df[keep], feb[keep]], ignore_index=True)
+    data = zero_february_income_tax(data)
+
+    values = data[numeric_cols].fillna(0)
+    values = values.astype({
+        col: "int64" if pd.api.types.is_integer_dtype(values[col]) else "float64"
+        for col in numeric_cols
+    })
+    return values.groupby(data[emp_col].to_numpy()).sum()
+
+
+def non_zero_mask(df, numeric_cols, emp_col="EMPLOYEE NAME"):
+    """
+    Employee x column matrix of booleans (indexed by employee name, sorted):
+    True where the employee has a non-zero value in the column. Income Tax
+    in February months counts as zero, as it does in the reports.
+    """
+    non_zero = df[numeric_cols].fillna(0).ne(0)
+    if INCOME_TAX_COL in non_zero.columns:
+        non_zero.loc[df["Month"].isin(FEB_VARIANTS).to_numpy(), INCOME_TAX_COL] = False
+    return non_zero.groupby(df[emp_col].to_numpy()).any()
+
+
+def active_columns(mask, emp_name, numeric_cols, feb_row=None):
+    """
+    Columns shown in an employee's report, in numeric_cols order: those
+    with a non-zero value in the mask, plus INCOME TAX always. When a
+    synthetic February row is added (feb_row), GROUP ACCIDENTAL POLICY is
+    forced in, and PT too if the row has PT.
+    """
+    row = mask.loc[emp_name]
+    active = set(col for col in numeric_cols if col in row.index and row[col])
+
+    # Always show Income Tax even if all values are zero
+    active.add(INCOME_TAX_COL)
+
+    # PT and GROUP ACCIDENTAL POLICY appear when February is added
+    if feb_row is not None:
+        pt_val = feb_row.get(PT_COL, 0)
+        if not pd.isna(pt_val) and pt_val != 0:
+            active.add(PT_COL)
+        active.add(GAP_COL)
+
+    # Preserve original order of columns
+    return [col for col in numeric_cols if col in active]
+
+
+def _first_text(sorted_df, col, starts):
+    """Value of a column in each employee's first row (None if the column is missing)."""
+    if col not in sorted_df.columns:
+        return None
+    return sorted_df[col].to_numpy(dtype=object)[starts]
+
+
+def _display(value):
+    return "" if pd.isna(value) else value
+
+
+def build_employee_tables(df, numeric_cols, emp_col="EMPLOYEE NAME", feb=None, totals=None):
+    """
+    Precompute the report of every employee in one pass over the combined
+    frame. feb / totals may be passed in when the caller already computed
+    february_rows() / employee_totals() (e.g. for the summary as well).
+    Returns a list of dicts (in employee name order) holding plain
+    values for the renderer:
+
+    name, salutation, school_name - row 2 of the report
+    columns                       - active numeric columns, in numeric_cols order
+    rows                          - [month label, value per column] per month,
+                                    the synthetic February row included
+    totals                        - total per column
+    """
+    if df.empty:
+        return []
+
+    if feb is None:
+        feb = february_rows(df, emp_col)
+    if totals is None:
+        totals = employee_totals(df, numeric_cols, emp_col, feb)
+    mask = non_zero_mask(df, numeric_cols, emp_col)
+    feb_by_emp = feb.set_index(emp_col)
+
+    combined = pd.concat([df, feb], ignore_index=True)
+    months = combined["Month"].astype(object)
+    codes, names = pd.factorize(combined[emp_col], sort=True)
+    month_key = months.map(month_sort_key).to_numpy(dtype=np.int64, copy=True)
+    month_key[len(df):] = SYNTHETIC_MONTH_KEY
+
+    # Employee, then month order; ties keep the original row order
+    order = np.lexsort((np.arange(len(combined)), month_key, codes))
+    sorted_df = combined.iloc[order].reset_index(drop=True)
+    emp = codes[order]
+    n_rows = len(order)
+
+    starts = np.flatnonzero(np.r_[True, emp[1:] != emp[:-1]])
+    ends = np.r_[starts[1:], n_rows]
+
+    data = zero_february_income_tax(sorted_df[["Month"] + numeric_cols].copy())
+    display = {
+        col: np.where(data[col].isna().to_numpy(), "", data[col].to_numpy(dtype=object))
+        for col in numeric_cols
+    }
+
+    total_values = totals.reindex(names).to_numpy(dtype=object)
+    total_pos = {col: i for i, col in enumerate(numeric_cols)}
+
+    genders = _first_text(sorted_df, "GENDER M/F", starts)
+    schools = _first_text(sorted_df, "NAME OF SCHOOL", starts)
+    month_labels = [MONTH_DISPLAY.get(m, m) for m in sorted_df["Month"].astype(object)]
+
+    tables = []
+    for g, (start, end) in enumerate(zip(starts, ends)):
+        name = names[g]
+        feb_row = feb_by_emp.loc[name] if name in feb_by_emp.index else None
+        columns = active_columns(mask, name, numeric_cols, feb_row)
+
+        rows = [
+            [month_labels[pos]] + [display[col][pos] for col in columns]
+            for pos in range(start, end)
+        ]
+
+        gender = "" if genders is None else str(genders[g]).strip().upper()
+        school_name = "" if schools is None else _display(schools[g])
+
+        tables.append({
+            'name': name,
+            'salutation': "SHRI" if gender == "M" else "SHRIMATI",
+            'school_name': school_name,
+            'columns': columns,
+            'rows': rows,
+            'totals': [total_values[g, total_pos[col]] for col in columns],
+        })
+
+    return tables
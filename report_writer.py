@@ -0,0 +1,465 @@
+import hashlib
+import io
+import os
+import re
+import zipfile
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.compat import safe_string
+from openpyxl.compat.numbers import NUMERIC_TYPES
+from openpyxl.styles import Font, Alignment, Border, Side
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.page import PageMargins
+
+# Renderer for the employee income-tax workbooks. It only needs the plain
+# tables of report_engine.build_employee_tables(), so batches of employees
+# can be rendered and saved in worker processes (write_report_batch).
+#
+# create_employee_report() builds the workbook with openpyxl. Reports are
+# saved through a template compiled once from its output (report_template):
+# styles.xml, theme, page setup and print settings are reused as-is and only
+# the cell data of each employee is written into the sheet.
+
+REPORT_TITLE = "INCOME TAX DETAILS 2025-26"
+FOOTER_TEXT = "या तक्त्यात काही चूक आढळून आल्यास तात्काळ मुख्याध्यापकांच्या लक्षात आणून द्यावी, नजरचुकीने काही चूक झाल्यास लागणा-या आयकरास कर्मचारी स्वत: जबाबदार राहील."
+
+# Column widths - fill A4 landscape (~140 Excel character units with margins)
+TOTAL_PAGE_WIDTH = 140
+SR_NO_WIDTH = 6
+MONTH_WIDTH = 11
+
+MAX_CELL_TEXT = 32767  # longer strings are truncated by openpyxl
+
+_STYLES = None
+_TEMPLATE = None
+
+
+def report_styles():
+    """Fonts, border and alignments of the report, created once per process."""
+    global _STYLES
+    if _STYLES is None:
+        _STYLES = {
+            'title_font': Font(bold=True, size=14),
+            'header_font': Font(bold=True, size=9),
+            'bold_font': Font(bold=True),
+            'thin_border': Border(
+                left=Side(style='thin'),
+                right=Side(style='thin'),
+                top=Side(style='thin'),
+                bottom=Side(style='thin')
+            ),
+            'center_align': Alignment(horizontal='center', vertical='center', wrap_text=True),
+            'right_align': Alignment(horizontal='right'),
+        }
+    return _STYLES
+
+
+def safe_filename(emp_name):
+    """Employee name with characters Windows does not allow in file names replaced."""
+    safe_name = emp_name.replace("/", "_").replace("\\", "_").replace(":", "_")
+    safe_name = safe_name.replace("*", "_").replace("?", "_").replace('"', "_")
+    safe_name = safe_name.replace("<", "_").replace(">", "_").replace("|", "_")
+    return safe_name
+
+
+def column_widths(total_cols):
+    """Width of every report column: SR. NO., MONTH, then the data columns sharing the rest of the page."""
+    widths = [SR_NO_WIDTH, MONTH_WIDTH]
+
+    # Distribute remaining width evenly among data columns
+    remaining_cols = total_cols - 2
+    if remaining_cols > 0:
+        remaining_width = TOTAL_PAGE_WIDTH - SR_NO_WIDTH - MONTH_WIDTH
+        col_width = remaining_width / remaining_cols
+        # Ensure minimum readable width of 8 and max of 15
+        col_width = max(8, min(15, col_width))
+        widths.extend([col_width] * remaining_cols)
+
+    return widths
+
+
+def create_employee_report(table, styles=None):
+    """Render one employee's report from a precomputed build_employee_tables() entry."""
+    if styles is None:
+        styles = report_styles()
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Income Tax Details"
+
+    emp_name = table['name']
+    salutation = table['salutation']
+    active_numeric_cols = table['columns']
+    
+    # ===== STYLES (built once per process) =====
+    title_font = styles['title_font']
+    header_font = styles['header_font']
+    bold_font = styles['bold_font']
+    thin_border = styles['thin_border']
+    center_align = styles['center_align']
+    right_align = styles['right_align']
+    
+    # ===== ROW 1: TITLE =====
+    ws.cell(row=1, column=1, value=REPORT_TITLE)
+    ws.cell(row=1, column=1).font = title_font
+    ws.cell(row=1, column=1).alignment = center_align
+    total_cols = 2 + len(active_numeric_cols)  # SR.NO + MONTH + numeric columns
+    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=total_cols)
+    
+    # ===== ROW 2: EMPLOYEE NAME + SCHOOL =====
+    ws.cell(row=2, column=1, value=f"{salutation} {emp_name}")
+    ws.cell(row=2, column=1).font = bold_font
+    
+    school_name = table['school_name']
+    school_col = min(10, total_cols)
+    ws.cell(row=2, column=school_col, value=school_name)
+    ws.cell(row=2, column=school_col).font = bold_font
+    
+    # ===== ROW 3: COLUMN HEADERS =====
+    headers = ["SR. NO.", "MONTH"] + active_numeric_cols
+    for col_idx, header in enumerate(headers, start=1):
+        cell = ws.cell(row=3, column=col_idx, value=header)
+        cell.font = header_font
+        cell.border = thin_border
+        cell.alignment = center_align
+    
+    # ===== DATA ROWS (months, then the synthetic February if any) =====
+    current_row = 4
+    
+    for sr_no, row in enumerate(table['rows'], start=1):
+        for col_idx, value in enumerate([sr_no] + row, start=1):
+            cell = ws.cell(row=current_row, column=col_idx, value=value)
+            cell.border = thin_border
+            if col_idx > 1:
+                cell.alignment = right_align
+        
+        current_row += 1
+    
+    # ===== TOTAL ROW =====
+    totals = ["", "Total"] + table['totals']
+    
+    for col_idx, value in enumerate(totals, start=1):
+        cell = ws.cell(row=current_row, column=col_idx, value=value)
+        cell.border = thin_border
+        cell.font = bold_font
+        if col_idx > 1:
+            cell.alignment = right_align
+    
+    current_row += 2
+    
+    # ===== FOOTER =====
+    ws.cell(row=current_row, column=1, value=FOOTER_TEXT)
+    current_row += 2
+    
+    ws.cell(row=current_row, column=1, value="Employee Signature")
+    ws.cell(row=current_row, column=1).font = bold_font
+    headmaster_col = max(14, total_cols - 3)
+    ws.cell(row=current_row, column=headmaster_col, value="Headmaster")
+    ws.cell(row=current_row, column=headmaster_col).font = bold_font
+    current_row += 1
+    
+    ws.cell(row=current_row, column=1, value=f"{salutation} {emp_name}")
+    ws.cell(row=current_row, column=1).font = bold_font
+    
+    # ===== COLUMN WIDTHS - Dynamic to fill A4 Landscape =====
+    for i, width in enumerate(column_widths(total_cols), start=1):
+        ws.column_dimensions[get_column_letter(i)].width = width
+    
+    # ===== PAGE SETUP FOR A4 LANDSCAPE PRINTING =====
+    ws.page_setup.orientation = 'landscape'
+    ws.page_setup.paperSize = ws.PAPERSIZE_A4
+    
+    # Fit all content to 1 page
+    ws.page_setup.fitToPage = True
+    ws.page_setup.fitToWidth = 1
+    ws.page_setup.fitToHeight = 1
+    
+    # Set comfortable margins (in inches)
+    ws.page_margins = PageMargins(
+        left=0.3, right=0.3,
+        top=0.4, bottom=0.4,
+        header=0.2, footer=0.2
+    )
+    
+    # Set print area to include ALL content
+    last_row = current_row
+    last_col = get_column_letter(total_cols)
+    ws.print_area = f'A1:{last_col}{last_row}'
+    
+    # Repeat header row on each page
+    ws.print_title_rows = '3:3'
+    
+    # Center horizontally, align to top (no vertical centering)
+    ws.print_options.horizontalCentered = True
+    ws.print_options.verticalCentered = False
+    
+    return wb
+
+
+# ===== PRECOMPILED TEMPLATE =====
+
+SHEET_PART = "xl/worksheets/sheet1.xml"
+WORKBOOK_PART = "xl/workbook.xml"
+CORE_PART = "docProps/core.xml"
+
+# Report rendered once to compile the template, and the cell holding each
+# layout role in it (the role's style id is read from that cell)
+SAMPLE_TABLE = {
+    'name': "SAMPLE",
+    'salutation': "SHRI",
+    'school_name': "SCHOOL",
+    'columns': ["INCOME TAX"],
+    'rows': [["Apr-2025", 0]],
+    'totals': [0],
+}
+SAMPLE_ROLES = {
+    'title': "A1", 'bold': "A2", 'header': "A3", 'sr_no': "A4",
+    'data': "B4", 'total_first': "A5", 'total': "B5", 'footer': "A7",
+}
+
+_TIMESTAMP_RE = re.compile(r"\d{4}-\d\d-\d\dT\d\d:\d\d:\d\dZ")
+
+
+def _split_at(text, pattern):
+    """Split text around the first match of pattern; the match itself is dropped."""
+    match = re.search(pattern, text, re.S)
+    if match is None:
+        raise ValueError(f"Report template: {pattern!r} not found")
+    return text[:match.start()], text[match.end():]
+
+
+def compile_report_template():
+    """
+    Render SAMPLE_TABLE with create_employee_report() and cut its xlsx into
+    the parts every report shares (styles, theme, relationships, sheet
+    views, margins, page setup) around the parts that vary per employee
+    (dimension, column widths, sheet data, title merge, print area).
+    """
+    buffer = io.BytesIO()
+    create_employee_report(SAMPLE_TABLE).save(buffer)
+
+    with zipfile.ZipFile(buffer) as archive:
+        parts = {name: archive.read(name) for name in archive.namelist()}
+
+    sheet = parts[SHEET_PART].decode("utf-8")
+    styles = {}
+    for role, ref in SAMPLE_ROLES.items():
+        match = re.search(rf'<c r="{ref}"( s="\d+")?', sheet)
+        styles[role] = (match.group(1) or "") if match else ""
+
+    head, rest = _split_at(sheet, r'(?<=<dimension ref=")[^"]*')
+    after_dimension, rest = _split_at(rest, r'<cols>.*?</cols>')
+    _, rest = _split_at(rest, r'<sheetData>.*?</sheetData>')
+    before_merge, tail = _split_at(rest, r'(?<=<mergeCell ref=")[^"]*')
+
+    workbook = parts[WORKBOOK_PART].decode("utf-8")
+    workbook_head, workbook_tail = _split_at(workbook, r"\$A\$1:\$[A-Z]+\$\d+")
+
+    return {
+        'names': list(parts),
+        'parts': parts,
+        'styles': styles,
+        'sheet': [head, after_dimension, before_merge, tail],
+        'workbook': [workbook_head, workbook_tail],
+        'core': parts[CORE_PART].decode("utf-8"),
+    }
+
+
+def report_template():
+    """The compiled report template, built once per process."""
+    global _TEMPLATE
+    if _TEMPLATE is None:
+        _TEMPLATE = compile_report_template()
+    return _TEMPLATE
+
+
+def _is_plain_value(value):
+    """Values the template writes exactly as openpyxl would (others go through openpyxl)."""
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return (
+            len(value) <= MAX_CELL_TEXT
+            and not (value.startswith("=") and len(value) > 1)
+            and ILLEGAL_CHARACTERS_RE.search(value) is None
+        )
+    if isinstance(value, NUMERIC_TYPES) and not isinstance(value, bool):
+        return safe_string(value) not in ("", "nan", "inf", "-inf")
+    return False
+
+
+def _cell_xml(ref, style, value):
+    if value is None:
+        return f'<c r="{ref}"{style} t="n" />'
+    if isinstance(value, str):
+        if value == "":
+            return f'<c r="{ref}"{style} t="inlineStr" />'
+        stripped = value.strip()
+        space = ' xml:space="preserve"' if stripped and value != stripped else ""
+        return f'<c r="{ref}"{style} t="inlineStr"><is><t{space}>{escape(value)}</t></is></c>'
+    return f'<c r="{ref}"{style} t="n"><v>{safe_string(value)}</v></c>'
+
+
+def _row_xml(row, cells):
+    """Row element from (column, style, value) cells in column order."""
+    xml = [f'<row r="{row}">']
+    for col, style, value in cells:
+        xml.append(_cell_xml(f"{get_column_letter(col)}{row}", style, value))
+    xml.append("</row>")
+    return "".join(xml)
+
+
+def render_report_parts(table, template):
+    """
+    The sheet and workbook XML of one employee's report, laid out exactly as
+    create_employee_report() does. Returns None when a value needs openpyxl's
+    own conversion (formula-like or very long text, NaN, non-numeric types).
+    """
+    emp_name = table['name']
+    salutation = table['salutation']
+    school_name = table['school_name']
+    headers = ["SR. NO.", "MONTH"] + table['columns']
+    totals = ["", "Total"] + table['totals']
+
+    values = [emp_name, salutation, school_name] + headers + totals
+    values.extend(value for row in table['rows'] for value in row)
+    if not all(_is_plain_value(value) for value in values):
+        return None
+
+    styles = template['styles']
+    total_cols = len(headers)
+    name_line = f"{salutation} {emp_name}"
+
+    rows = [
+        _row_xml(1, [(1, styles['title'], REPORT_TITLE)]),
+        _row_xml(2, [(1, styles['bold'], name_line), (min(10, total_cols), styles['bold'], school_name)]),
+        _row_xml(3, [(col, styles['header'], header) for col, header in enumerate(headers, start=1)]),
+    ]
+
+    current_row = 4
+    for sr_no, row in enumerate(table['rows'], start=1):
+        cells = [(1, styles['sr_no'], sr_no)]
+        cells.extend((col, styles['data'], value) for col, value in enumerate(row, start=2))
+        rows.append(_row_xml(current_row, cells))
+        current_row += 1
+
+    cells = [(1, styles['total_first'], totals[0])]
+    cells.extend((col, styles['total'], value) for col, value in enumerate(totals[1:], start=2))
+    rows.append(_row_xml(current_row, cells))
+    current_row += 2
+
+    rows.append(_row_xml(current_row, [(1, styles['footer'], FOOTER_TEXT)]))
+    current_row += 2
+
+    headmaster_col = max(14, total_cols - 3)
+    rows.append(_row_xml(current_row, [
+        (1, styles['bold'], "Employee Signature"), (headmaster_col, styles['bold'], "Headmaster"),
+    ]))
+    current_row += 1
+    rows.append(_row_xml(current_row, [(1, styles['bold'], name_line)]))
+
+    last_row = current_row
+    last_col = get_column_letter(total_cols)
+    dimension = f"A1:{get_column_letter(max(total_cols, headmaster_col))}{last_row}"
+    cols = "".join(
+        f'<col width="{safe_string(width)}" customWidth="1" min="{i}" max="{i}" />'
+        for i, width in enumerate(column_widths(total_cols), start=1)
+    )
+
+    head, after_dimension, before_merge, tail = template['sheet']
+    sheet = "".join([
+        head, dimension, after_dimension, "<cols>", cols, "</cols>",
+        "<sheetData>", "".join(rows), "</sheetData>", before_merge, f"A1:{last_col}1", tail,
+    ])
+    workbook_head, workbook_tail = template['workbook']
+    workbook = f"{workbook_head}$A$1:${last_col}${last_row}{workbook_tail}"
+    return sheet, workbook
+
+
+def write_employee_report(table, file_path, template=None):
+    """
+    Save one employee's report by filling the compiled template; the file
+    holds the same sheet create_employee_report() would produce.
+    """
+    if template is None:
+        template = report_template()
+
+    rendered = render_report_parts(table, template)
+    if rendered is None:
+        create_employee_report(table).save(file_path)
+        return
+
+    sheet, workbook = rendered
+    now = datetime.now(tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    varying = {
+        SHEET_PART: sheet.encode("utf-8"),
+        WORKBOOK_PART: workbook.encode("utf-8"),
+        CORE_PART: _TIMESTAMP_RE.sub(now, template['core']).encode("utf-8"),
+    }
+
+    with zipfile.ZipFile(file_path, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+        for name in template['names']:
+            archive.writestr(name, varying.get(name, template['parts'][name]))
+
+
+def report_layout_key(template=None):
+    """
+    Hash of the report layout: the shared template parts and the sample
+    report rendered through them. Changes whenever the layout code does.
+    """
+    if template is None:
+        template = report_template()
+    digest = hashlib.sha1()
+    for name in template['names']:
+        if name != CORE_PART:
+            digest.update(template['parts'][name])
+    for part in render_report_parts(SAMPLE_TABLE, template):
+        digest.update(part.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def employee_fingerprint(table):
+    """Hash of everything an employee's report shows: name row, active columns, month rows and totals."""
+    return hashlib.sha1(repr(sorted(table.items())).encode("utf-8")).hexdigest()
+
+
+def save_employee_report(table, output_dir, template=None):
+    """Render and save one employee's report; returns the file path."""
+    file_path = os.path.join(output_dir, f"{safe_filename(table['name'])}.xlsx")
+    write_employee_report(table, file_path, template)
+    return file_path
+
+
+def write_report_batch(tables, output_dir):
+    """
+    Render and save a batch of employee reports (runs in a worker process).
+    Returns (names written, [(name, error message)] for failed employees).
+    """
+    template = report_template()
+    written = []
+    failures = []
+    for table in tables:
+        try:
+            save_employee_report(table, output_dir, template)
+            written.append(table['name'])
+        except Exception as e:
+            failures.append((table['name'], str(e)))
+    return written, failures
+
+
+# ===== PACKAGING =====
+
+def zip_folder(folder_path):
+    """Create a ZIP of a folder and return bytes."""
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for root, _, files in os.walk(folder_path):
+            for file in files:
+                file_path = os.path.join(root, file)
+                arcname = os.path.relpath(file_path, folder_path)
+                zip_file.write(file_path, arcname=arcname)
+    zip_buffer.seek(0)
+    return zip_buffer
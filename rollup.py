@@ -0,0 +1,325 @@
+import os
+import glob
+import argparse
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.worksheet import Worksheet
+
+from identity import normalize_id, resolve_employee_names
+from merged_store import HAS_PYARROW, load_manifest, load_merged_data, merged_store_path, save_manifest
+from merged_writer import THIN_BORDER, add_named_style
+from report_engine import clean_employee_names, employee_totals
+from schema import EXCLUDE_COLUMNS, NUMERIC_COLUMNS
+
+# District rollup of the per-school summaries.
+# Every merged school's per-employee totals (the same totals summary.py
+# writes) are kept in one compact Parquet store with the employee's block,
+# UDISE code and school name. A run only recomputes the schools whose
+# merged source files changed since the store was written; the district
+# workbook is then built from the store alone, with subtotals per SCHOOL
+# UDISE CODE and per BLOCK / TALUKA. Without pyarrow nothing is stored and
+# every school is recomputed.
+
+# ===== CONFIGURATION =====
+# Usage: python rollup.py [--full]
+# Example: python rollup.py
+# Example: python rollup.py --full   (recompute every school, ignoring the store)
+
+ROOT_DIR = os.environ.get("EXCEL_MERGER_ROOT", r"D:\excel merger")
+ROLLUP_STORE_FILE = "District_Employee_Totals.parquet"
+ROLLUP_MANIFEST_FILE = "District_Employee_Totals.manifest.json"
+DISTRICT_SUMMARY_FILE = "District_Summary_Totals.xlsx"
+
+# Bump when the stored totals change meaning, so every school is recomputed
+ROLLUP_VERSION = 1
+
+EMP_NAME_COL = "EMPLOYEE NAME"
+BLOCK_COL = "BLOCK / TALUKA"
+UDISE_COL = "SCHOOL UDISE CODE"
+SCHOOL_NAME_COL = "NAME OF SCHOOL"
+KEY_COLUMNS = ["School", BLOCK_COL, UDISE_COL, SCHOOL_NAME_COL, EMP_NAME_COL]
+
+MERGED_SUFFIX = "_Merged_Monthly.xlsx"
+MERGE_MANIFEST_SUFFIX = "_Merged_Monthly.manifest.json"
+
+
+def parse_args(argv=None):
+    """Parse the rollup options."""
+    parser = argparse.ArgumentParser(description="Write the district summary with block and school subtotals.")
+    parser.add_argument("--full", action="store_true",
+                        help="Recompute every school instead of only schools whose source files changed")
+    return parser.parse_args(argv)
+
+
+# ===== SCHOOL TOTALS =====
+
+def merged_schools(root_dir=ROOT_DIR):
+    """Schools (sorted) with a merged workbook under root_dir."""
+    return sorted(
+        os.path.basename(path)[:-len(MERGED_SUFFIX)]
+        for path in glob.glob(os.path.join(root_dir, f"*{MERGED_SUFFIX}"))
+    )
+
+
+def school_input_key(root_dir, school_folder):
+    """
+    What a school's totals depend on: the source file digests recorded in
+    the merge manifest (unchanged when the same files are merged again),
+    else the size and modification time of the merged workbook.
+    """
+    manifest = load_manifest(os.path.join(root_dir, f"{school_folder}{MERGE_MANIFEST_SUFFIX}"))
+    if manifest and "months" in manifest:
+        return {"heading": manifest.get("heading"), "months": manifest["months"]}
+    stat = os.stat(os.path.join(root_dir, f"{school_folder}{MERGED_SUFFIX}"))
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _first_text(df, col, names, clean):
+    """Per employee (in names order): first non-empty value of a column as text."""
+    if col not in df.columns:
+        return [""] * len(names)
+    first = df[col].astype(object).groupby(df[EMP_NAME_COL].to_numpy()).first()
+    return [clean(value) for value in first.reindex(names)]
+
+
+def _block_text(value):
+    return "" if pd.isna(value) else " ".join(str(value).split()).upper()
+
+
+def _school_name_text(value):
+    return "" if pd.isna(value) else " ".join(str(value).split())
+
+
+def school_totals(df, school_folder):
+    """
+    Per-employee totals of one school's merged data (df as load_merged_data()
+    returns it), as summary.py computes them, with the KEY_COLUMNS in front.
+    """
+    numeric_cols = [col for col in NUMERIC_COLUMNS if col in df.columns and col not in EXCLUDE_COLUMNS]
+
+    df = clean_employee_names(df, EMP_NAME_COL)
+    df, _ = resolve_employee_names(df, EMP_NAME_COL)
+
+    totals = employee_totals(df, numeric_cols, EMP_NAME_COL)
+    names = totals.index.tolist()
+
+    keys = pd.DataFrame({
+        "School": school_folder,
+        BLOCK_COL: _first_text(df, BLOCK_COL, names, _block_text),
+        UDISE_COL: _first_text(df, UDISE_COL, names, normalize_id),
+        SCHOOL_NAME_COL: _first_text(df, SCHOOL_NAME_COL, names, _school_name_text),
+        EMP_NAME_COL: names,
+    })
+    return pd.concat([keys, totals.reset_index(drop=True)], axis=1)
+
+
+def read_rollup_store(path):
+    """Stored per-employee totals of every school (None if there is no usable store)."""
+    if not HAS_PYARROW or not os.path.exists(path):
+        return None
+    try:
+        return pd.read_parquet(path)
+    except Exception:
+        return None
+
+
+def write_rollup_store(path, totals):
+    """Store the per-employee totals of every school as Parquet (skipped without pyarrow)."""
+    if not HAS_PYARROW:
+        return False
+    totals.to_parquet(path, index=False)
+    return True
+
+
+def update_school_totals(root_dir=ROOT_DIR, full=False):
+    """
+    Per-employee totals of every merged school under root_dir: schools whose
+    merged workbook is unchanged since the last run come from the store,
+    the others are recomputed. Returns the combined frame, school order.
+    """
+    store_file = os.path.join(root_dir, ROLLUP_STORE_FILE)
+    manifest_file = os.path.join(root_dir, ROLLUP_MANIFEST_FILE)
+
+    schools = merged_schools(root_dir)
+    if not schools:
+        raise ValueError(f"No merged school workbooks found in {root_dir}")
+
+    keys = {school: school_input_key(root_dir, school) for school in schools}
+
+    manifest = load_manifest(manifest_file) or {}
+    stored = None if full or manifest.get("version") != ROLLUP_VERSION else read_rollup_store(store_file)
+    previous = manifest.get("schools", {}) if stored is not None else {}
+    stale = [school for school in schools if previous.get(school) != keys[school]]
+
+    print(f"Schools: {len(schools)}")
+    if stored is not None:
+        print(f"Schools to recompute: {len(stale)} of {len(schools)}")
+
+    frames = {}
+    if stored is not None:
+        for school, frame in stored.groupby("School", sort=False):
+            if school in keys and school not in stale:
+                frames[school] = frame
+
+    for school in stale:
+        merged_file = os.path.join(root_dir, f"{school}{MERGED_SUFFIX}")
+        df, _ = load_merged_data(merged_file, merged_store_path(root_dir, school))
+        frames[school] = school_totals(df, school)
+        print(f"  [{school}] - {len(frames[school])} employees")
+
+    combined = pd.concat([frames[school] for school in schools], ignore_index=True)
+
+    # Columns missing in some schools total zero there
+    numeric_cols = district_numeric_columns(combined)
+    combined[numeric_cols] = combined[numeric_cols].fillna(0)
+    for col in numeric_cols:
+        if (combined[col] % 1 == 0).all():
+            combined[col] = combined[col].astype("int64")
+
+    if stale or set(previous) != set(schools):
+        if write_rollup_store(store_file, combined):
+            save_manifest(manifest_file, {"version": ROLLUP_VERSION, "schools": keys})
+    return combined
+
+
+# ===== DISTRICT WORKBOOK =====
+
+def district_numeric_columns(totals):
+    """Numeric columns of the stored totals, in NUMERIC_COLUMNS order."""
+    return [col for col in NUMERIC_COLUMNS if col in totals.columns]
+
+
+def district_rows(totals):
+    """
+    Rows of the district sheet: ('employee' | 'school' | 'block' | 'grand', values)
+    with values keyed like the totals columns. Employees are ordered by
+    block, UDISE code, school and name; every school is followed by its
+    subtotal (labelled with its UDISE code, or its name when that is blank),
+    every block by its block subtotal.
+    """
+    numeric_cols = district_numeric_columns(totals)
+    ordered = totals.sort_values([BLOCK_COL, UDISE_COL, "School", EMP_NAME_COL], kind="stable")
+
+    school_keys = [BLOCK_COL, UDISE_COL, "School"]
+    school_sums = ordered.groupby(school_keys, sort=False)[numeric_cols].sum()
+    block_sums = ordered.groupby(BLOCK_COL, sort=False)[numeric_cols].sum()
+
+    records = ordered.to_dict("records")
+    rows = []
+    for i, record in enumerate(records):
+        rows.append(('employee', record))
+        following = records[i + 1] if i + 1 < len(records) else None
+
+        block, udise = record[BLOCK_COL], record[UDISE_COL]
+        school = tuple(record[col] for col in school_keys)
+        if following is None or tuple(following[col] for col in school_keys) != school:
+            label = f"SCHOOL TOTAL {udise or record['School']}"
+            rows.append(('school', {EMP_NAME_COL: label, **school_sums.loc[school].to_dict()}))
+        if following is None or following[BLOCK_COL] != block:
+            label = f"BLOCK TOTAL {block}".rstrip()
+            rows.append(('block', {EMP_NAME_COL: label, **block_sums.loc[block].to_dict()}))
+
+    rows.append(('grand', {EMP_NAME_COL: "GRAND TOTAL", **ordered[numeric_cols].sum().to_dict()}))
+    return rows
+
+
+def write_district_workbook(totals, output_file):
+    """Write the district summary sheet (write-only, streamed row by row)."""
+    numeric_cols = district_numeric_columns(totals)
+    headers = ["SR.NO", BLOCK_COL, UDISE_COL, SCHOOL_NAME_COL, EMP_NAME_COL] + numeric_cols
+    total_cols = len(headers)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title="District Summary")
+
+    center_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
+    styles = {
+        'title': add_named_style(wb, "District Title", font=Font(bold=True, size=14), alignment=center_align),
+        'header': add_named_style(
+            wb, "District Header", border=THIN_BORDER, alignment=center_align,
+            font=Font(bold=True, size=10, color="FFFFFF"),
+            fill=PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid"),
+        ),
+        'text': add_named_style(wb, "District Text", border=THIN_BORDER),
+        'number': add_named_style(wb, "District Number", border=THIN_BORDER, alignment=Alignment(horizontal='right')),
+        'school': add_named_style(
+            wb, "District School Total", border=THIN_BORDER, font=Font(bold=True),
+            fill=PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid"),
+        ),
+        'block': add_named_style(
+            wb, "District Block Total", border=THIN_BORDER, font=Font(bold=True),
+            fill=PatternFill(start_color="B4C6E7", end_color="B4C6E7", fill_type="solid"),
+        ),
+        'grand': add_named_style(wb, "District Grand Total", border=THIN_BORDER, font=Font(bold=True)),
+    }
+
+    def styled(value, style):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = style
+        return cell
+
+    # Dimensions have to be in place before the first row is streamed
+    widths = [6, 18, 14, 30, 30] + [14] * len(numeric_cols)
+    for col_idx, width in enumerate(widths, start=1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = width
+    ws.merged_cells.add(f"A1:{get_column_letter(total_cols)}1")
+    ws.freeze_panes = "F3"
+
+    # Page setup
+    ws.page_setup.orientation = 'landscape'
+    ws.page_setup.paperSize = Worksheet.PAPERSIZE_A4
+    ws.page_setup.fitToWidth = 1
+    ws.page_setup.fitToHeight = 0
+    ws.sheet_properties.pageSetUpPr.fitToPage = True
+
+    # Row 1: Title, Row 2: Column Headers
+    ws.append([styled("District - Employee Summary Totals (2025-26)", styles['title'])])
+    ws.append([styled(header, styles['header']) for header in headers])
+
+    sr_no = 0
+    for kind, values in district_rows(totals):
+        if kind == 'employee':
+            sr_no += 1
+            text_style, number_style = styles['text'], styles['number']
+            lead = [sr_no, values[BLOCK_COL], values[UDISE_COL], values[SCHOOL_NAME_COL], values[EMP_NAME_COL]]
+        else:
+            text_style = number_style = styles[kind]
+            lead = ["", "", "", "", values[EMP_NAME_COL]]
+        ws.append(
+            [styled(value, text_style) for value in lead]
+            + [styled(values[col], number_style) for col in numeric_cols]
+        )
+
+    wb.save(output_file)
+
+
+# =================== MAIN ===================
+
+def rollup(root_dir=ROOT_DIR, full=False):
+    """
+    Update the per-school totals store under root_dir and write
+    DISTRICT_SUMMARY_FILE from it. Returns the path of the district workbook.
+    """
+    output_file = os.path.join(root_dir, DISTRICT_SUMMARY_FILE)
+    print(f"Root: {root_dir}")
+    print(f"Output: {output_file}")
+
+    totals = update_school_totals(root_dir, full)
+
+    print(f"\nCreating district summary with {len(totals)} employees...")
+    write_district_workbook(totals, output_file)
+
+    print(f"\n[SUCCESS] District summary created: {output_file}")
+    return output_file
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rollup(full=args.full)
+
+
+if __name__ == "__main__":
+    main()
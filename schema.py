@@ -0,0 +1,208 @@
+import os
+import pandas as pd
+
+# Canonical column layout of the merged payroll data, shared by report.py,
+# summary.py and app.py. Source headers arrive with stray spaces
+# ("WASHING ALLOWANCE ", "DESIGNATION "); apply_schema() resolves them to
+# the names below once, when the merged data is loaded, and gives the
+# columns compact dtypes.
+
+# Month order for sorting - handles both naming styles (apr25, APR 25)
+MONTH_ORDER = [
+    "mar 25", "mar25", "MAR 25",
+    "apr 25", "apr25", "APR 25",
+    "may 25", "may25", "MAY 25",
+    "jun 25", "jun25", "JUN 25",
+    "jul 25", "jul25", "JUL 25",
+    "aug 25", "aug25", "AUG 25",
+    "sep 25", "sep25", "SEP 25",
+    "oct 25", "oct25", "OCT 25",
+    "nov 25", "nov25", "NOV 25",
+    "dec 25", "dec25", "DEC 25",
+    "jan 26", "jan26", "JAN 26",
+    "feb 26", "feb26", "FEB 26"
+]
+
+# Map folder names to display names (handles variations)
+MONTH_DISPLAY = {
+    "mar 25": "Mar-2025", "mar25": "Mar-2025", "MAR 25": "Mar-2025",
+    "apr 25": "Apr-2025", "apr25": "Apr-2025", "APR 25": "Apr-2025",
+    "may 25": "May-2025", "may25": "May-2025", "MAY 25": "May-2025",
+    "jun 25": "Jun-2025", "jun25": "Jun-2025", "JUN 25": "Jun-2025",
+    "jul 25": "Jul-2025", "jul25": "Jul-2025", "JUL 25": "Jul-2025",
+    "aug 25": "Aug-2025", "aug25": "Aug-2025", "AUG 25": "Aug-2025",
+    "sep 25": "Sep-2025", "sep25": "Sep-2025", "SEP 25": "Sep-2025",
+    "oct 25": "Oct-2025", "oct25": "Oct-2025", "OCT 25": "Oct-2025",
+    "nov 25": "Nov-2025", "nov25": "Nov-2025", "NOV 25": "Nov-2025",
+    "dec 25": "Dec-2025", "dec25": "Dec-2025", "DEC 25": "Dec-2025",
+    "jan 26": "Jan-2026", "jan26": "Jan-2026", "JAN 26": "Jan-2026",
+    "feb 26": "Feb-2026", "feb26": "Feb-2026", "FEB 26": "Feb-2026"
+}
+
+# Columns to exclude from report (metadata columns, not data)
+EXCLUDE_COLUMNS = [
+    "Unnamed: 0", "SR.NO", "Source_File", "Month", "Month_Order",
+    "EMPLOYEE NAME", "GENDER M/F", "NAME OF SCHOOL",
+    # User requested to remove these columns from all reports:
+    "GROSS AFTER DEDUCTING FA", "GROSS PAYMENT AFTER GOVT DEDUCTIONS",
+    "GROSS PAYMENT AFTER NPS DEDUCTIONS", "NGR(TOTAL DEDUCTIONS)",
+    "EMPLOYEE NET SALARY", "TOTAL GOVT DEDUCTIONS", "NPS TOTAL"
+]
+
+# Columns that are identifiers (show once, not per month)
+INFO_COLUMNS = [
+    "BLOCK / TALUKA", "SCHOOL UDISE CODE", "SCHOOL SHALARTH DDO CODE",
+    "S.R NO OF EMPL", "SHALARTH ID", "DESIGNATION", "GPF NO", "DCPS NO",
+    "PRAN NO", "PAN NO", "ADHAR NO", "MOB NO", "EMAIL ID",
+    "DDO BANK NAME", "DDO BANK ACCOUNT NUMBER", "DDO BANK IFSC CODE",
+    "BANK NAME", "BANK ACCOUNT NUMBER", "BANK IFSC CODE", "BRANCH NAME",
+    "PAY MATRIX", "REMARKS"
+]
+
+# Numeric columns (these will be shown per month and summed)
+NUMERIC_COLUMNS = [
+    "BASIC PAY", "D.A", "HRA", "T.A", "T.A ARREARS", "TRIBAL ALLOWANCE",
+    "WASHING ALLOWANCE", "DA ARREARS", "HRA ARREARS", "BASIC ARREARS",
+    "CLA", "NPS EMPR ALLOW", "TOTAL PAY", "F A",
+    "GPF", "GPF ADV", "PT", "GIS(ZP)", "GIS SCOUT", "DCPS REGULAR",
+    "DCPS DELAYED", "DCPS PAY ARREARS RECOVERY", "REVENUE STAMP",
+    "DCPS DA ARREARS RECOVERY", "GROUP ACCIDENTAL POLICY", "NAA",
+    "TOTAL GOVT DEDUCTIONS",
+    "NPS EMPR CONTRI", "NPS EMP CONTRI", "NPS EMPR CONTRI ARR",
+    "NPS EMP CONTRI ARR", "NPS TOTAL",
+    "INCOME TAX", "CO-OP BANK", "NGR(LIC)", "NGR(SOCIETY LOAN)", "NGR(MISC)",
+    "NGR(OTHER RECOVERY)", "NGR(RD)", "NGR(OTHER DEDUCTION)"
+]
+
+# Low-cardinality text columns, stored once per distinct value
+CATEGORY_COLUMNS = ["Month", "Source_File", "NAME OF SCHOOL", "DESIGNATION"]
+
+# Columns identifying a row in the coerced-cells report
+COERCION_ID_COLUMNS = ["Month", "Source_File", "SR.NO", "EMPLOYEE NAME"]
+
+# Other spellings of canonical columns, e.g. {"DESIG": "DESIGNATION"}
+# (keys are compared after whitespace is collapsed)
+COLUMN_ALIASES = {}
+
+INT32_MIN, INT32_MAX = -2**31, 2**31 - 1
+
+
+def canonical_column(name):
+    """Canonical name of a source column: whitespace collapsed, aliases resolved."""
+    if not isinstance(name, str):
+        return name
+    name = " ".join(name.split())
+    return COLUMN_ALIASES.get(name, name)
+
+
+def canonicalize_columns(df):
+    """
+    Rename columns to their canonical names. Columns that end up with the
+    same name (e.g. "DA ARREARS" in one month, "DA ARREARS " in another)
+    are folded into one, taking the first non-empty value per row.
+    """
+    names = [canonical_column(col) for col in df.columns]
+    if names == list(df.columns):
+        return df
+
+    df = df.copy()
+    df.columns = names
+    if not df.columns.duplicated().any():
+        return df
+
+    folded = {}
+    for idx, name in enumerate(names):
+        ser = df.iloc[:, idx]
+        folded[name] = ser if name not in folded else folded[name].combine_first(ser)
+    return pd.DataFrame(folded, index=df.index)
+
+
+def compact_numeric(ser):
+    """
+    Money column as a compact numeric dtype: whole-rupee columns become
+    nullable Int32, anything with paise stays float64. Text such as "-" or
+    "NIL" becomes missing.
+    """
+    values = pd.to_numeric(ser, errors="coerce")
+    present = values.dropna()
+    if (present % 1 == 0).all() and (len(present) == 0 or (
+        present.min() >= INT32_MIN and present.max() <= INT32_MAX
+    )):
+        return values.astype("Int32")
+    return values.astype("float64")
+
+
+def month_sort_key(month):
+    """Position of a month label in the financial year (unknown labels last)."""
+    return MONTH_ORDER.index(month) if month in MONTH_ORDER else 99
+
+
+def month_categorical(ser):
+    """Month labels as a categorical ordered by the financial year."""
+    present = ser.dropna().astype(str).unique().tolist()
+    categories = sorted(present, key=lambda m: (month_sort_key(m), m))
+    return pd.Categorical(ser.astype(object).where(ser.notna(), None), categories=categories, ordered=True)
+
+
+def coerce_numeric_columns(df):
+    """
+    Convert every NUMERIC_COLUMNS column to a compact numeric dtype in one
+    pass. Returns the frame and a report of the cells whose text ("-",
+    "NIL", ...) could not be read as a number and became empty.
+    """
+    df = df.copy()
+    id_cols = [col for col in COERCION_ID_COLUMNS if col in df.columns]
+    coerced = []
+
+    for col in NUMERIC_COLUMNS:
+        if col not in df.columns:
+            continue
+        raw = df[col]
+        values = compact_numeric(raw)
+
+        # Blank cells are simply empty; only real text is worth reporting
+        lost = values.isna() & raw.notna()
+        if lost.any():
+            lost &= raw.astype(str).str.strip() != ""
+        if lost.any():
+            cells = df.loc[lost, id_cols].astype(object)
+            cells["Column"] = col
+            cells["Value"] = raw[lost].astype(str)
+            coerced.append(cells)
+
+        df[col] = values
+
+    if coerced:
+        report = pd.concat(coerced).sort_index(kind="stable")
+    else:
+        report = pd.DataFrame(columns=id_cols + ["Column", "Value"])
+    return df, report.reset_index(drop=True)
+
+
+def write_coercion_report(coerced, path):
+    """Write the coerced-cells report as CSV (a stale one is removed when there is nothing to report)."""
+    if len(coerced):
+        coerced.to_csv(path, index=False)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def apply_schema(df):
+    """
+    Canonical names and compact dtypes for the combined merged data:
+    numeric money columns and categorical Month / Source_File / school /
+    designation columns. Returns the frame and the coerced-cells report
+    of coerce_numeric_columns().
+    """
+    df = canonicalize_columns(df)
+    df, coerced = coerce_numeric_columns(df)
+
+    for col in CATEGORY_COLUMNS:
+        if col not in df.columns:
+            continue
+        if col == "Month":
+            df[col] = month_categorical(df[col])
+        else:
+            df[col] = df[col].astype("category")
+
+    return df, coerced
@@ -0,0 +1,230 @@
+import hashlib
+import pandas as pd
+
+# Single-open reader for the monthly .xls payroll files.
+# Each source file is opened with xlrd exactly once; the SR.NO header row,
+# the table, the heading block and the column header styles are all taken
+# from that same in-memory Book. xlrd itself is imported on the first open,
+# so runs served entirely from the parse cache never load it.
+
+HEADER_SCAN_ROWS = 40
+FINGERPRINT_ROWS = 6
+MAX_KNOWN_LAYOUTS = 256
+
+# Layout fingerprint -> SR.NO row offset and header row values (column map)
+_HEADER_LAYOUTS = {}
+
+H_ALIGN_MAP = {0: 'general', 1: 'left', 2: 'center', 3: 'right'}
+
+
+def open_source_book(source, formatting_info=False):
+    """Open an .xls file (path or raw bytes) with xlrd."""
+    import xlrd
+
+    if isinstance(source, (bytes, bytearray)):
+        return xlrd.open_workbook(file_contents=source, formatting_info=formatting_info)
+    return xlrd.open_workbook(source, formatting_info=formatting_info)
+
+
+def layout_fingerprint(sheet):
+    """
+    Hash of the top-of-sheet layout: column count, cell types of the first
+    rows and the merged ranges above the table. Files from the same
+    departmental template share it even when heading text (month, school)
+    differs.
+    """
+    rows = min(FINGERPRINT_ROWS, sheet.nrows)
+    parts = [sheet.ncols]
+    parts.extend(tuple(sheet.row_types(row_idx)) for row_idx in range(rows))
+    parts.extend(sorted(m for m in sheet.merged_cells if m[0] < HEADER_SCAN_ROWS))
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def _scan_header_row(sheet):
+    for row_idx in range(min(HEADER_SCAN_ROWS, sheet.nrows)):
+        for value in sheet.row_values(row_idx):
+            if str(value).upper() == "SR.NO":
+                return row_idx
+    return None
+
+
+def find_header_row_in_sheet(sheet, label=""):
+    """
+    Find the row containing the SR.NO header in an xlrd sheet.
+
+    The SR.NO row and column names are remembered per layout fingerprint;
+    a later file with the same fingerprint only has its remembered header
+    row checked. Files with a new layout (or a header that moved) are scanned.
+    """
+    fingerprint = layout_fingerprint(sheet)
+    known = _HEADER_LAYOUTS.get(fingerprint)
+    if known is not None and known['header_row'] < sheet.nrows:
+        if tuple(sheet.row_values(known['header_row'])) == known['columns']:
+            return known['header_row']
+
+    header_row = _scan_header_row(sheet)
+    if header_row is None:
+        raise ValueError(f"SR.NO not found in {label}".rstrip())
+
+    if len(_HEADER_LAYOUTS) >= MAX_KNOWN_LAYOUTS:
+        _HEADER_LAYOUTS.clear()
+    _HEADER_LAYOUTS[fingerprint] = {
+        'header_row': header_row,
+        'columns': tuple(sheet.row_values(header_row)),
+    }
+    return header_row
+
+
+def _value_extent(sheet):
+    """
+    Rows/cols actually holding values (or merges).
+
+    A Book opened with formatting_info=True also contains blank formatted
+    cells, which would otherwise show up as extra "Unnamed" columns and
+    all-NaN rows compared to a plain pandas read.
+    """
+    import xlrd
+
+    nrows = ncols = 0
+    skip = (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK)
+    for row_idx in range(sheet.nrows):
+        types = sheet.row_types(row_idx)
+        for col_idx in range(len(types) - 1, -1, -1):
+            if types[col_idx] not in skip:
+                nrows = row_idx + 1
+                ncols = max(ncols, col_idx + 1)
+                break
+    for (rlo, rhi, clo, chi) in sheet.merged_cells:
+        nrows = max(nrows, rhi)
+        ncols = max(ncols, chi)
+    return nrows, ncols
+
+
+def read_heading_block(book, sheet, header_row):
+    """Collect heading cells, merges, column widths and row heights above the header."""
+    cells = []
+    for row_idx in range(header_row):
+        for col_idx in range(sheet.ncols):
+            cell = sheet.cell(row_idx, col_idx)
+            value = cell.value
+
+            if value == '' or value is None:
+                continue
+
+            xf = book.xf_list[cell.xf_index]
+            font = book.font_list[xf.font_index]
+
+            cells.append({
+                'row': row_idx,
+                'col': col_idx,
+                'value': value,
+                'font_name': font.name,
+                'font_size': font.height // 20,
+                'bold': font.bold,
+                'italic': font.italic,
+                'h_align': H_ALIGN_MAP.get(xf.alignment.hor_align, 'general'),
+            })
+
+    merged = [
+        (rlo, rhi, clo, chi)
+        for (rlo, rhi, clo, chi) in sheet.merged_cells
+        if rlo < header_row
+    ]
+
+    col_widths = {}
+    for col_idx in range(sheet.ncols):
+        col_info = sheet.colinfo_map.get(col_idx)
+        if col_info:
+            col_widths[col_idx] = col_info.width / 256
+
+    row_heights = {}
+    for row_idx in range(header_row):
+        row_info = sheet.rowinfo_map.get(row_idx)
+        if row_info:
+            row_heights[row_idx] = row_info.height / 20
+
+    return {
+        'header_row': header_row,
+        'cells': cells,
+        'merged': merged,
+        'col_widths': col_widths,
+        'row_heights': row_heights,
+    }
+
+
+def read_column_header_styles(book, sheet, header_row):
+    """Extract column header styles from the SR.NO row."""
+    styles = []
+    for col_idx in range(sheet.ncols):
+        cell = sheet.cell(header_row, col_idx)
+        xf = book.xf_list[cell.xf_index]
+        font = book.font_list[xf.font_index]
+
+        # Background color
+        pattern_colour_index = xf.background.pattern_colour_index
+        bg_color = None
+        if pattern_colour_index and pattern_colour_index < len(book.colour_map):
+            rgb = book.colour_map.get(pattern_colour_index)
+            if rgb:
+                bg_color = '{:02X}{:02X}{:02X}'.format(*rgb)
+
+        styles.append({
+            'bold': font.bold,
+            'italic': font.italic,
+            'font_size': font.height // 20,
+            'font_name': font.name,
+            'bg_color': bg_color,
+        })
+
+    return styles
+
+
+def clean_source_frame(df):
+    """Drop empty rows and the GRAND TOTAL row from a parsed source table."""
+    df = df.dropna(how="all")
+
+    if "SR.NO" in df.columns:
+        df = df[df["SR.NO"].astype(str).str.upper() != "GRAND TOTAL"]
+
+    return df
+
+
+def read_source_table(book, header_row):
+    """Parse the payroll table below the SR.NO row from an open Book."""
+    sheet = book.sheet_by_index(0)
+    read_kwargs = {}
+
+    if book.formatting_info:
+        nrows, ncols = _value_extent(sheet)
+        read_kwargs["nrows"] = max(nrows - header_row - 1, 0)
+        if ncols < sheet.ncols:
+            read_kwargs["usecols"] = list(range(ncols))
+
+    df = pd.read_excel(book, engine="xlrd", header=header_row, **read_kwargs)
+    return clean_source_frame(df)
+
+
+def read_source_file(source, with_layout=False, label=None):
+    """
+    Open a source .xls once and return everything the merge needs from it.
+
+    Returns a dict with 'header_row' and the cleaned 'data' frame. With
+    with_layout=True it also holds the 'heading' block and 'column_styles'
+    of the SR.NO row (read from the same Book, no second open).
+    """
+    if label is None:
+        label = source if isinstance(source, str) else "file"
+
+    book = open_source_book(source, formatting_info=with_layout)
+    sheet = book.sheet_by_index(0)
+    header_row = find_header_row_in_sheet(sheet, label)
+
+    result = {'header_row': header_row, 'heading': None, 'column_styles': None}
+
+    # Layout first: pandas releases the Book's resources once it is done with it
+    if with_layout:
+        result['heading'] = read_heading_block(book, sheet, header_row)
+        result['column_styles'] = read_column_header_styles(book, sheet, header_row)
+
+    result['data'] = read_source_table(book, header_row)
+    return result
@@ -0,0 +1,242 @@
+import os
+import random
+import argparse
+
+from schema import MONTH_ORDER, NUMERIC_COLUMNS
+
+# Synthetic payroll data in the layout of the departmental .xls files, for
+# benchmarks and trying the pipeline without real payroll data. Every
+# school gets month folders of .xls files with a merged heading block, the
+# SR.NO header row (with the stray trailing spaces the real files have),
+# one row per employee and a GRAND TOTAL row, so merge_alternate.py reads
+# them exactly like the real ones. The same seed gives the same files.
+
+# Writing .xls needs xlwt, a development dependency (requirements-dev.txt)
+try:
+    import xlwt
+    HAS_XLWT = True
+except ImportError:
+    HAS_XLWT = False
+
+# ===== CONFIGURATION =====
+# Usage: python synthetic_data.py ROOT_DIR [--schools N] [--employees N] [--months N] [--files N]
+# Example: python synthetic_data.py "D:\bench" --schools 3 --employees 120
+# Example: python synthetic_data.py /tmp/bench --months 12 --files 4 --header-row 8
+
+DEFAULT_EMPLOYEES = 60
+DEFAULT_MONTHS = 11          # Mar-Jan: employees get the synthetic February row
+DEFAULT_FILES = 2            # .xls files per month folder
+DEFAULT_HEADER_ROW = 5       # 0-based row of SR.NO; the heading block sits above it
+
+# Month folder names, one spelling per month in financial-year order ("MAR 25", ...)
+MONTH_FOLDERS = MONTH_ORDER[2::3]
+
+INFO_HEADERS = [
+    "SR.NO", "BLOCK / TALUKA", "SCHOOL UDISE CODE", "SCHOOL SHALARTH DDO CODE",
+    "SHALARTH ID", "EMPLOYEE NAME", "GENDER M/F", "DESIGNATION ", "NAME OF SCHOOL",
+    "PAN NO", "DCPS NO", "BANK ACCOUNT NUMBER",
+]
+
+# Source spellings of some numeric headers (canonicalized by the schema on load)
+HEADER_SPELLINGS = {"WASHING ALLOWANCE": "WASHING ALLOWANCE ", "DA ARREARS": "DA ARREARS "}
+
+BLOCKS = ["BASMATH", "AUNDHA", "HINGOLI", "KALAMNURI", "SENGAON"]
+SURNAMES = [
+    "PATIL", "DESHMUKH", "JADHAV", "KALE", "SHINDE", "PAWAR", "MORE", "GAIKWAD",
+    "KULKARNI", "JOSHI", "CHAVAN", "WAGH", "SURYAWANSHI", "BHOSALE", "RATHOD",
+]
+GIVEN_NAMES = [
+    "RAVI", "ASHA", "MOHAN", "PRIYA", "ANIL", "SUNITA", "VIJAY", "MEENA", "SANJAY",
+    "KAVITA", "RAJESH", "LATA", "SURESH", "ANITA", "GANESH", "REKHA",
+]
+DESIGNATIONS = ["ASSISTANT TEACHER", "GRADUATE TEACHER", "HEAD MASTER", "CLERK"]
+
+
+def parse_args(argv=None):
+    """Parse the output folder and dataset size."""
+    parser = argparse.ArgumentParser(description="Generate synthetic monthly payroll .xls files.")
+    parser.add_argument("root", help="Folder to create the school folders in")
+    parser.add_argument("--schools", type=int, default=1, help="Number of schools (default: 1)")
+    parser.add_argument("--employees", type=int, default=DEFAULT_EMPLOYEES,
+                        help=f"Employees per school (default: {DEFAULT_EMPLOYEES})")
+    parser.add_argument("--months", type=int, default=DEFAULT_MONTHS,
+                        help=f"Months from March on, at most 12 (default: {DEFAULT_MONTHS})")
+    parser.add_argument("--files", type=int, default=DEFAULT_FILES,
+                        help=f".xls files per month (default: {DEFAULT_FILES})")
+    parser.add_argument("--header-row", type=int, default=DEFAULT_HEADER_ROW,
+                        help=f"0-based row of the SR.NO header, at least 4 (default: {DEFAULT_HEADER_ROW})")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    return parser.parse_args(argv)
+
+
+# ===== EMPLOYEES =====
+
+def make_employees(count, rng):
+    """Employees of one school: unique names, IDs, gender, designation and base pay."""
+    employees = []
+    used = set()
+    while len(employees) < count:
+        name = f"{rng.choice(SURNAMES)} {rng.choice(GIVEN_NAMES)} {rng.choice(GIVEN_NAMES)}RAO"
+        if name in used:
+            if len(used) >= len(SURNAMES) * len(GIVEN_NAMES) ** 2:
+                name = f"{name} {len(employees)}"
+            else:
+                continue
+        used.add(name)
+        number = rng.randrange(10**9, 10**10)
+        employees.append({
+            'name': name,
+            'shalarth_id': f"SH{number}",
+            'pan_no': f"{''.join(rng.choice('ABCDEFGHJKLMNPQRSTUVWXYZ') for _ in range(5))}{number % 10000:04d}K",
+            'dcps_no': f"DC{number + 7}",
+            'account': str(rng.randrange(10**13, 10**14)),
+            'gender': rng.choice("MF"),
+            'designation': rng.choice(DESIGNATIONS),
+            'basic': rng.randrange(25000, 95000, 100),
+        })
+    return employees
+
+
+def pay_row(employee, month, rng):
+    """Numeric columns of one employee's month (some cells blank, "-" or "NIL" as in the real files)."""
+    basic = employee['basic']
+    values = dict.fromkeys(NUMERIC_COLUMNS, 0)
+    values.update({
+        "BASIC PAY": basic,
+        "D.A": round(basic * 0.53),
+        "HRA": round(basic * 0.10),
+        "T.A": 1350,
+        "WASHING ALLOWANCE": rng.choice([0, 0, 50]),
+        "DA ARREARS": rng.choice(["", "NIL", 0, 0, round(basic * 0.04)]),
+        "PT": 300 if month.startswith("FEB") else 200,
+        "GIS(ZP)": 360,
+        "NPS EMP CONTRI": round(basic * 0.10),
+        "NPS EMPR CONTRI": round(basic * 0.14),
+        "INCOME TAX": rng.choice([0, 0, "-", rng.randrange(500, 8000, 100)]),
+        "NGR(LIC)": rng.choice(["", 0, rng.randrange(500, 3000, 50)]),
+        "CO-OP BANK": rng.choice(["", 0, rng.randrange(1000, 10000, 100)]),
+    })
+    values["TOTAL PAY"] = sum(values[col] for col in ("BASIC PAY", "D.A", "HRA", "T.A"))
+    values["NPS TOTAL"] = values["NPS EMP CONTRI"] + values["NPS EMPR CONTRI"]
+    values["TOTAL GOVT DEDUCTIONS"] = values["PT"] + values["GIS(ZP)"] + values["NPS EMP CONTRI"]
+    return values
+
+
+# ===== WRITING =====
+
+def _styles():
+    return {
+        'title': xlwt.easyxf("font: bold on, height 280; align: horiz center"),
+        'heading': xlwt.easyxf("font: bold on; align: horiz left"),
+        'header': xlwt.easyxf(
+            "font: bold on; align: horiz center, wrap on; "
+            "pattern: pattern solid, fore_colour light_yellow; "
+            "borders: left thin, right thin, top thin, bottom thin"
+        ),
+        'cell': xlwt.easyxf("borders: left thin, right thin, top thin, bottom thin"),
+        'total': xlwt.easyxf("font: bold on; borders: left thin, right thin, top thin, bottom thin"),
+    }
+
+
+def write_month_file(path, school, month, employees, rows, header_row, styles):
+    """One source .xls: heading block, SR.NO header row, employee rows and GRAND TOTAL."""
+    numeric_headers = [HEADER_SPELLINGS.get(col, col) for col in NUMERIC_COLUMNS]
+    headers = INFO_HEADERS + numeric_headers
+
+    wb = xlwt.Workbook()
+    ws = wb.add_sheet("Sheet1")
+
+    ws.write_merge(0, 0, 0, 10, "ZILLA PARISHAD - PAY BILL OF PRIMARY TEACHERS", styles['title'])
+    ws.write_merge(1, 1, 0, 5, f"NAME OF SCHOOL : {school['name']}", styles['heading'])
+    ws.write(1, 7, f"UDISE : {school['udise']}", styles['heading'])
+    ws.write_merge(2, 2, 0, 5, f"PAY BILL FOR THE MONTH OF {month}", styles['heading'])
+    ws.write(3, 0, f"BLOCK : {school['block']}", styles['heading'])
+
+    ws.col(INFO_HEADERS.index("EMPLOYEE NAME")).width = 256 * 36
+    ws.col(INFO_HEADERS.index("NAME OF SCHOOL")).width = 256 * 24
+
+    for col_idx, header in enumerate(headers):
+        ws.write(header_row, col_idx, header, styles['header'])
+
+    totals = dict.fromkeys(NUMERIC_COLUMNS, 0)
+    row_idx = header_row + 1
+    for sr_no, (employee, values) in enumerate(zip(employees, rows), start=1):
+        info = [
+            sr_no, school['block'], school['udise'], school['ddo_code'],
+            employee['shalarth_id'], employee['name'], employee['gender'],
+            employee['designation'], school['name'], employee['pan_no'],
+            employee['dcps_no'], employee['account'],
+        ]
+        for col_idx, value in enumerate(info + [values[col] for col in NUMERIC_COLUMNS]):
+            ws.write(row_idx, col_idx, value, styles['cell'])
+        for col in NUMERIC_COLUMNS:
+            if isinstance(values[col], (int, float)):
+                totals[col] += values[col]
+        row_idx += 1
+
+    ws.write(row_idx, 0, "GRAND TOTAL", styles['total'])
+    for col_idx, col in enumerate(NUMERIC_COLUMNS, start=len(INFO_HEADERS)):
+        ws.write(row_idx, col_idx, totals[col], styles['total'])
+
+    wb.save(path)
+
+
+def generate_school(root_dir, school_folder, employees=DEFAULT_EMPLOYEES, months=DEFAULT_MONTHS,
+                    files_per_month=DEFAULT_FILES, header_row=DEFAULT_HEADER_ROW, seed=0):
+    """
+    Write root_dir/school_folder/<month>/<n>.xls for the first `months`
+    months of the financial year, the employees split over
+    files_per_month files. Returns the number of files written.
+    """
+    if not 1 <= months <= len(MONTH_FOLDERS):
+        raise ValueError(f"months must be between 1 and {len(MONTH_FOLDERS)}")
+    if header_row < 4:
+        raise ValueError("header_row must be at least 4 (the heading block needs rows 0-3)")
+    if not HAS_XLWT:
+        raise SystemExit("[ERROR] Writing .xls files needs xlwt: pip install xlwt "
+                         "(or pip install -r requirements-dev.txt)")
+
+    rng = random.Random(f"{seed}:{school_folder}")
+    school = {
+        'name': school_folder.upper(),
+        'block': rng.choice(BLOCKS),
+        'udise': str(rng.randrange(27160000000, 27169999999)),
+        'ddo_code': str(rng.randrange(10**9, 10**10)),
+    }
+    staff = make_employees(employees, rng)
+    styles = _styles()
+
+    per_file = -(-len(staff) // files_per_month)
+    written = 0
+    for month in MONTH_FOLDERS[:months]:
+        month_dir = os.path.join(root_dir, school_folder, month)
+        os.makedirs(month_dir, exist_ok=True)
+        for file_idx in range(files_per_month):
+            chunk = staff[file_idx * per_file:(file_idx + 1) * per_file]
+            if not chunk:
+                continue
+            rows = [pay_row(employee, month, rng) for employee in chunk]
+            path = os.path.join(month_dir, f"{school_folder}_{file_idx + 1}.xls")
+            write_month_file(path, school, month, chunk, rows, header_row, styles)
+            written += 1
+    return written
+
+
+def generate_dataset(root_dir, schools=1, employees=DEFAULT_EMPLOYEES, months=DEFAULT_MONTHS,
+                     files_per_month=DEFAULT_FILES, header_row=DEFAULT_HEADER_ROW, seed=0):
+    """Write `schools` school folders (school_01, ...) under root_dir. Returns the folder names."""
+    folders = [f"school_{i:02d}" for i in range(1, schools + 1)]
+    for folder in folders:
+        count = generate_school(root_dir, folder, employees, months, files_per_month, header_row, seed)
+        print(f"  [{folder}] - {count} files")
+    return folders
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(f"Root: {args.root}")
+    generate_dataset(args.root, args.schools, args.employees, args.months, args.files, args.header_row, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import pandas as pd
+
+from identity import normalize_id, resolve_employee_names
+
+# Merge and refuse cases of the employee identity resolution (identity.py).
+# Run with: python -m pytest test_identity.py
+
+
+def payroll(rows):
+    """Frame of (name, month, source file, SR.NO[, PAN NO]) rows."""
+    columns = ["EMPLOYEE NAME", "Month", "Source_File", "SR.NO", "PAN NO"]
+    return pd.DataFrame([row + ("",) * (len(columns) - len(row)) for row in rows], columns=columns)
+
+
+def people(df):
+    resolved, _ = resolve_employee_names(df)
+    return resolved["EMPLOYEE NAME"].tolist()
+
+
+def test_spelling_variants_in_different_months_merge():
+    names = people(payroll([
+        ("PATIL RAVI MOHANRAO", "APR 25", "a.xls", 1),
+        ("PATIL RAVI MOHANRAO", "MAY 25", "a.xls", 1),
+        ("PATIL RAVII MOHANRAO", "JUN 25", "a.xls", 1),
+    ]))
+    assert len(set(names)) == 1
+
+
+def test_word_order_and_dots_merge():
+    names = people(payroll([
+        ("KALE ASHA VIJAYRAO", "APR 25", "a.xls", 1),
+        ("ASHA KALE VIJAYRAO", "MAY 25", "a.xls", 1),
+        ("KALE ASHA.VIJAYRAO", "JUN 25", "a.xls", 1),
+    ]))
+    assert len(set(names)) == 1
+
+
+def test_dropped_father_name_in_another_month_merges():
+    names = people(payroll([
+        ("KALE ASHA VIJAYRAO", "APR 25", "a.xls", 1),
+        ("KALE ASHA", "MAY 25", "a.xls", 1),
+    ]))
+    assert len(set(names)) == 1
+
+
+def test_similar_names_paid_in_the_same_month_stay_apart():
+    names = people(payroll([
+        ("PATIL RAVI MOHANRAO", "APR 25", "a.xls", 1),
+        ("PATIL RAVI SOHANRAO", "APR 25", "a.xls", 2),
+        ("PATIL RAVI MOHANRAO", "MAY 25", "a.xls", 1),
+        ("PATIL RAVI SOHANRAO", "MAY 25", "a.xls", 2),
+    ]))
+    assert names[0] != names[1]
+
+
+def test_dropped_father_name_in_the_same_month_stays_apart():
+    names = people(payroll([
+        ("KALE ASHA", "APR 25", "a.xls", 1),
+        ("KALE ASHA VIJAYRAO", "APR 25", "a.xls", 2),
+        ("KALE ASHA", "MAY 25", "a.xls", 1),
+        ("KALE ASHA VIJAYRAO", "MAY 25", "a.xls", 2),
+    ]))
+    assert names[0] != names[1]
+
+
+def test_two_names_on_one_bill_stay_apart():
+    names = people(payroll([
+        ("JADHAV ANIL", "APR 25", "a.xls", 1),
+        ("JADHAV ANIL SURESHRAO", "APR 25", "a.xls", 2),
+    ]))
+    assert names[0] != names[1]
+
+
+def test_same_sr_no_in_two_bills_of_a_month_merges():
+    df = payroll([
+        ("PATIL RAM", "APR 24", "a.xls", 1),
+        ("JOSHI ANIL", "APR 24", "a.xls", 2),
+        ("PATIL RAM S", "APR 24", "b.xls", 1),
+        ("JOSHI ANIL K", "APR 24", "b.xls", 2),
+    ])
+    df["SHALARTH ID"] = ["S1", "S2", "S1", "S2"]
+    names = people(df)
+    assert names[0] == names[2]
+    assert names[1] == names[3]
+    assert names[0] != names[1]
+
+
+def test_shared_id_across_months_merges():
+    names = people(payroll([
+        ("SHINDE MEENA", "APR 25", "a.xls", 1, "ABCDE1234K"),
+        ("PAWAR MEENA", "MAY 25", "a.xls", 1, "ABCDE1234K"),
+    ]))
+    assert len(set(names)) == 1
+
+
+def test_id_shared_within_one_bill_is_a_placeholder():
+    names = people(payroll([
+        ("SHINDE MEENA", "APR 25", "a.xls", 1, "XYZAB9999K"),
+        ("GAIKWAD ANIL", "APR 25", "a.xls", 2, "XYZAB9999K"),
+        ("SHINDE MEENA", "MAY 25", "a.xls", 1, "XYZAB9999K"),
+        ("GAIKWAD ANIL", "MAY 25", "a.xls", 2, "XYZAB9999K"),
+    ]))
+    assert names[:2] == ["SHINDE MEENA", "GAIKWAD ANIL"]
+    assert names[2:] == names[:2]
+
+
+def test_placeholder_id_values_are_missing():
+    assert normalize_id("APPLIED") == ""
+    assert normalize_id(" applied for ") == ""
+    assert normalize_id(1234.0) == "1234"